@@ -1,13 +1,20 @@
 import tkinter as tk
+from package.agents import close_opening_book, create_agent, q_table_file
 from package.gui import ConnectFourGUI
-from package.optimization.minMax import MiniMaxAlgorithm
 from package.reinforcement.qLearning import QLearningAlgorithm
-from package.heuristic.MonteCarloTree import MonteCarloTreeSearch
 
 # Agent type configuration
-PLAYER1_TYPE = "QLEARNING"  # Options: "QLEARNING", "MONTECARLO", "MINMAX", "HUMAN"
-PLAYER2_TYPE = "MINMAX"  # Options: "QLEARNING", "MONTECARLO", "MINMAX", "HUMAN"
+PLAYER1_TYPE = "QLEARNING"  # Options: "QLEARNING", "MONTECARLO", "MINMAX", "SOLVER", "HUMAN"
+PLAYER2_TYPE = "MINMAX"  # Options: "QLEARNING", "MONTECARLO", "MINMAX", "SOLVER", "HUMAN"
 NUM_GAMES = 10
+# Turbo mode for AI vs AI runs: no delay between moves, the board is drawn every RENDER_EVERY moves
+# (0: only the final position of every game)
+TURBO = False
+RENDER_EVERY = 0
+# Number of Q table updates between two checkpoints of the Q tables
+CHECKPOINT_EVERY = 500
+# Number of past transitions a Q-learning agent keeps to replay them
+REPLAY_CAPACITY = 100000
 
 """Selects the type of agents to play the game"""
 
@@ -42,10 +49,10 @@ def select_agent_types():
     player2_var = tk.StringVar(value="MINMAX")
 
     tk.Label(selection_window, text="Player 1:").pack()
-    tk.OptionMenu(selection_window, player1_var, "QLEARNING", "MINMAX", "MONTECARLO", "HUMAN").pack()
+    tk.OptionMenu(selection_window, player1_var, "QLEARNING", "MINMAX", "MONTECARLO", "SOLVER", "HUMAN").pack()
 
     tk.Label(selection_window, text="Player 2:").pack()
-    tk.OptionMenu(selection_window, player2_var, "QLEARNING", "MINMAX", "MONTECARLO", "HUMAN").pack()
+    tk.OptionMenu(selection_window, player2_var, "QLEARNING", "MINMAX", "MONTECARLO", "SOLVER", "HUMAN").pack()
 
     tk.Button(selection_window, text="START", command=submit).pack()
 
@@ -53,25 +60,6 @@ def select_agent_types():
     return PLAYER1_TYPE, PLAYER2_TYPE, NUM_GAMES
 
 
-"""Creates the 2 agents."""""
-
-
-def create_agent(agent_type, player_number):
-    if agent_type == "QLEARNING":
-        agent = QLearningAlgorithm()
-        try:
-            agent.load_q_table(f"package/reinforcement/q_table_player{player_number}.json")
-        except FileNotFoundError:
-            pass
-        return agent
-    elif agent_type == "MINMAX":
-        return MiniMaxAlgorithm()
-    elif agent_type == "MONTECARLO":
-        return MonteCarloTreeSearch()
-    else:
-        return None
-
-
 """ Main function """
 
 
@@ -80,16 +68,19 @@ def main():
 
     root = tk.Tk()
 
-    player1_agent = create_agent(player1_type, 1)
-    player2_agent = create_agent(player2_type, 2)
+    player1_agent = create_agent(player1_type, 1, CHECKPOINT_EVERY, REPLAY_CAPACITY)
+    player2_agent = create_agent(player2_type, 2, CHECKPOINT_EVERY, REPLAY_CAPACITY)
 
-    gui = ConnectFourGUI(root, player1_algorithm=player1_agent, player2_algorithm=player2_agent, num_games=num_games)
+    gui = ConnectFourGUI(root, player1_algorithm=player1_agent, player2_algorithm=player2_agent, num_games=num_games,
+                         turbo=TURBO, render_every=RENDER_EVERY)
 
     if isinstance(player1_agent, QLearningAlgorithm):
-        gui.add_on_close_callback(lambda: player1_agent.save_q_table("package/reinforcement/q_table_player1.json"))
+        gui.add_on_close_callback(lambda: player1_agent.save_q_table(q_table_file(1)))
 
     if isinstance(player2_agent, QLearningAlgorithm):
-        gui.add_on_close_callback(lambda: player2_agent.save_q_table("package/reinforcement/q_table_player2.json"))
+        gui.add_on_close_callback(lambda: player2_agent.save_q_table(q_table_file(2)))
+
+    gui.add_on_close_callback(close_opening_book)
 
     root.protocol("WM_DELETE_WINDOW", gui.close)
     root.mainloop()
@@ -0,0 +1,83 @@
+# agents.py
+import os
+
+from package.heuristic.MonteCarloTree import MonteCarloTreeSearch
+from package.openingBook import OpeningBook
+from package.optimization.minMax import MiniMaxAlgorithm
+from package.optimization.solver import SolverAgent
+from package.reinforcement.qLearning import QLearningAlgorithm, calculate_reward
+from package.reinforcement.replayBuffer import ReplayBuffer
+
+AGENT_TYPES = ["QLEARNING", "MINMAX", "MONTECARLO", "SOLVER", "HUMAN"]
+
+# Opening book shared by all the agents, opened by the first create_agent call
+_opening_book = None
+_opening_book_opened = False
+
+
+"""Returns the file where the Q table of the player is saved."""
+def q_table_file(player_number):
+    return f"package/reinforcement/q_table_player{player_number}.bin"
+
+
+"""Returns the JSON file the Q table of the player was saved to by former versions."""
+def legacy_q_table_file(player_number):
+    return f"package/reinforcement/q_table_player{player_number}.json"
+
+
+"""Returns the opening book shared by the agents, opened once. It is only used if it has been
+generated (python -m package.openingBook), None otherwise."""
+def shared_opening_book():
+    global _opening_book, _opening_book_opened
+    if not _opening_book_opened:
+        _opening_book = OpeningBook.open_if_exists()
+        _opening_book_opened = True
+    return _opening_book
+
+
+"""Closes the shared opening book, when the agents are no longer used."""
+def close_opening_book():
+    global _opening_book, _opening_book_opened
+    if _opening_book is not None:
+        _opening_book.close()
+    _opening_book = None
+    _opening_book_opened = False
+
+
+"""Creates an agent. Returns None for a human player.
+If checkpoint_every is set, a Q-learning agent writes a checkpoint of its table every checkpoint_every updates.
+If replay_capacity is set, a Q-learning agent also learns from transitions replayed from a buffer of that size."""
+def create_agent(agent_type, player_number, checkpoint_every=None, replay_capacity=None):
+    opening_book = shared_opening_book()
+    if agent_type == "QLEARNING":
+        filename = q_table_file(player_number)
+        agent = QLearningAlgorithm(opening_book=opening_book)
+        if replay_capacity:
+            agent.replay_buffer = ReplayBuffer(replay_capacity)
+        if checkpoint_every is not None:
+            agent.checkpoint_file = filename
+            agent.checkpoint_every = checkpoint_every
+        if not os.path.exists(filename) and os.path.exists(legacy_q_table_file(player_number)):
+            # Converted to the binary format at the next save
+            filename = legacy_q_table_file(player_number)
+        agent.load_q_table(filename)
+        return agent
+    elif agent_type == "MINMAX":
+        return MiniMaxAlgorithm(opening_book=opening_book)
+    elif agent_type == "MONTECARLO":
+        return MonteCarloTreeSearch(opening_book=opening_book)
+    elif agent_type == "SOLVER":
+        return SolverAgent(opening_book=opening_book)
+    else:
+        return None
+
+
+"""Updates the Q table after a move, as the GUI does: the agent of the player whose turn it is
+after the move learns from it. state is the state key of the position before the move."""
+def update_learning_agent(game, player1_agent, player2_agent, state, action):
+    winner = game.check_winner()
+    done = winner is not None or game.is_full()
+    current_player_agent = player1_agent if game.current_player == 1 else player2_agent
+    if isinstance(current_player_agent, QLearningAlgorithm):
+        reward = calculate_reward(winner, done, game.current_player)
+        current_player_agent.update_q_table(state, action, reward, game.get_state_key(), done)
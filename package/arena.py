@@ -0,0 +1,137 @@
+# arena.py
+#
+# Plays AI vs AI games without the GUI: python -m package.arena QLEARNING MINMAX --games 10000 --workers 4
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from package.agents import AGENT_TYPES, close_opening_book, create_agent, q_table_file, update_learning_agent
+from package.game import ConnectFourGame
+from package.gameLog import GameLog
+from package.historyIndex import HistoryIndex
+from package.reinforcement.qLearning import QLearningAlgorithm
+from package.reinforcement.qTable import QTable
+
+
+"""Plays one game between the two agents, a None agent plays random moves.
+Returns the winner (None for a draw)."""
+def play_game(game, player1_agent, player2_agent):
+    game.reset_board()
+    while True:
+        available_columns = game.get_available_columns()
+        agent = player1_agent if game.current_player == 1 else player2_agent
+        current_state = game.get_state_key()
+        column = agent.get_next_move(game.board, available_columns) if agent is not None else None
+        if column not in available_columns:
+            column = random.choice(available_columns)
+        game.drop_piece(column)
+
+        # Same Q table update as the GUI
+        update_learning_agent(game, player1_agent, player2_agent, current_state, column)
+
+        winner = game.check_winner()
+        if winner is not None or game.is_full():
+            return winner
+
+
+"""Plays a series of games in the current process. Returns the result counts, the changes made to
+the Q tables of the learning agents (QTable.changed_rows) and, if record_history is set, the moves
+of the games."""
+def play_games(player1_type, player2_type, num_games, seed=None, record_history=False):
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed % 2 ** 32)
+
+    agents = [create_agent(player1_type, 1), create_agent(player2_type, 2)]
+    game = ConnectFourGame()
+    results = {"player1_wins": 0, "player2_wins": 0, "draws": 0}
+    games = []
+    for _ in range(num_games):
+        winner = play_game(game, *agents)
+        if winner == 1:
+            results["player1_wins"] += 1
+        elif winner == 2:
+            results["player2_wins"] += 1
+        else:
+            results["draws"] += 1
+        if record_history:
+            games.append(([(player, int(column)) for player, column in game.get_all_moves()], winner))
+
+    q_changes = [agent.q_table.changed_rows() if isinstance(agent, QLearningAlgorithm) else None for agent in agents]
+    for agent in agents:
+        if hasattr(agent, "close"):
+            agent.close()
+    close_opening_book()
+    return results, q_changes, games
+
+
+"""Plays num_games games between two agent types, split over worker processes.
+
+The Q tables of the learning agents are merged and saved at the end, the games are added to the
+game log and the history index if record_history is set.
+Returns the result counts, the elapsed time and the number of games per second."""
+def run_match(player1_type, player2_type, num_games, workers=1, record_history=False, save_q_tables=True):
+    start_time = time.perf_counter()
+    workers = max(1, min(workers, num_games))
+    chunks = [num_games // workers + (1 if i < num_games % workers else 0) for i in range(workers)]
+    seeds = [random.randrange(2 ** 63) for _ in chunks]
+
+    if workers == 1:
+        outcomes = [play_games(player1_type, player2_type, chunks[0], seeds[0], record_history)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(play_games, [player1_type] * workers, [player2_type] * workers,
+                                         chunks, seeds, [record_history] * workers))
+
+    results = {"games": num_games, "player1_wins": 0, "player2_wins": 0, "draws": 0}
+    for counts, _, _ in outcomes:
+        for name, count in counts.items():
+            results[name] += count
+    results["elapsed"] = time.perf_counter() - start_time
+    results["games_per_second"] = num_games / results["elapsed"] if results["elapsed"] > 0 else 0.0
+
+    if save_q_tables:
+        for player in (1, 2):
+            changes = [q_changes[player - 1] for _, q_changes, _ in outcomes if q_changes[player - 1] is not None]
+            if changes:
+                agent = create_agent("QLEARNING", player)
+                # Every worker started from the saved table: their changes to it are added up
+                agent.q_table = QTable.merge(changes, agent.q_table)
+                agent.save_q_table(q_table_file(player))
+        close_opening_book()
+
+    if record_history:
+        history_index = HistoryIndex.load()
+        game_log = GameLog()
+        for _, _, games in outcomes:
+            for moves, winner in games:
+                history_index.record_game(moves, winner)
+                game_log.append(moves, winner)
+        game_log.close()
+        history_index.save()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays AI vs AI games without the GUI.")
+    parser.add_argument("player1", choices=AGENT_TYPES[:-1])
+    parser.add_argument("player2", choices=AGENT_TYPES[:-1])
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--record-history", action="store_true", help="add the games to the game history")
+    args = parser.parse_args()
+
+    results = run_match(args.player1, args.player2, args.games, args.workers, args.record_history)
+    print(f"{results['games']} games in {results['elapsed']:.1f} s ({results['games_per_second']:.1f} games/s)")
+    print(f"Player 1 ({args.player1}) wins: {results['player1_wins']}")
+    print(f"Player 2 ({args.player2}) wins: {results['player2_wins']}")
+    print(f"Draws: {results['draws']}")
+
+
+if __name__ == "__main__":
+    main()
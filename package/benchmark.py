@@ -0,0 +1,341 @@
+# benchmark.py
+#
+# Performance benchmarks on a fixed set of positions, saved as JSON:
+#   python -m package.benchmark run --output benchmark.json
+# and compared with a baseline, flagging the metrics that got worse by more than the threshold:
+#   python -m package.benchmark compare baseline.json benchmark.json --threshold 0.1
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from package.game import ConnectFourGame
+from package.gameLog import GameLog
+from package.heuristic.MonteCarloTree import MonteCarloTreeSearch
+from package.historyIndex import HistoryIndex
+from package.optimization.minMax import MiniMaxAlgorithm
+from package.optimization.solver import ConnectFourSolver
+from package.reinforcement.qLearning import QLearningAlgorithm
+from package.reinforcement.qTable import QTable
+
+VERSION = 1
+SEED = 12345
+
+# Test positions as the columns played from the empty board: opening, middle game and crowded positions
+TEST_POSITIONS = [
+    "",
+    "3",
+    "33",
+    "3324",
+    "332415",
+    "33241560",
+    "3342243",
+    "0123456012",
+    "33332222444",
+    "3233442155",
+    "012345601234",
+    "213500640240410044",
+    "010430640155404430",
+]
+
+# Late positions the solver searches to the end in a few thousand nodes
+SOLVER_POSITIONS = [
+    "64663346411665440321040",
+    "1406400011406353561415330",
+    "353033102401145650011",
+    "20642622000145104226445",
+    "000502352355433350544223",
+    "15036422022154344625",
+]
+
+
+def position_board(moves):
+    game = ConnectFourGame()
+    for column in moves:
+        game.drop_piece(int(column))
+    return game
+
+
+def metric(value, unit, higher_is_better):
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+"""Returns the best time of repeat calls of function."""
+def best_time(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+"""Random games played with ConnectFourGame.drop_piece and check_winner."""
+def benchmark_game(games, repeat):
+    rng = random.Random(SEED)
+    # The same random columns for every repetition, a full column is skipped
+    columns = [rng.randrange(7) for _ in range(games * 60)]
+    moves = [0]
+
+    def play():
+        game = ConnectFourGame()
+        played = 0
+        index = 0
+        for _ in range(games):
+            game.reset_board()
+            while game.check_winner() is None and not game.is_full():
+                if game.drop_piece(columns[index % len(columns)]):
+                    played += 1
+                index += 1
+        moves[0] = played
+
+    elapsed = best_time(play, repeat)
+    return {"game.moves_per_second": metric(moves[0] / elapsed, "moves/s", True)}
+
+
+"""MiniMax searches of the test positions at every depth up to max_depth."""
+def benchmark_minimax(max_depth, repeat):
+    results = {}
+    total_nodes = 0
+    total_time = 0.0
+    for depth in range(1, max_depth + 1):
+        nodes = [0]
+        algorithm = MiniMaxAlgorithm(max_depth=depth)
+        games = [position_board(moves) for moves in TEST_POSITIONS]
+
+        def search():
+            nodes[0] = 0
+            for game in games:
+                algorithm.get_next_move(game.board, game.get_available_columns())
+                nodes[0] += algorithm.nodes
+
+        elapsed = best_time(search, repeat)
+        results[f"minimax.time_to_depth_{depth}"] = metric(elapsed, "s", False)
+        total_nodes += nodes[0]
+        total_time += elapsed
+    results["minimax.nodes_per_second"] = metric(total_nodes / total_time, "nodes/s", True)
+    return results
+
+
+"""MCTS searches of the test positions with a fixed number of iterations, on the compact tree
+and on the MonteCarloTreeNodes objects."""
+def benchmark_mcts(iterations, repeat):
+    results = {}
+    for name, compact_tree in (("compact", True), ("nodes", False)):
+        # Without the recorded games, so that the results do not depend on the local history
+        search = MonteCarloTreeSearch(time_limit=None, iteration_limit=iterations, compact_tree=compact_tree,
+                                      reuse_tree=False, history_index=HistoryIndex(os.devnull))
+        playouts = [0]
+
+        def run():
+            random.seed(SEED)
+            playouts[0] = 0
+            for moves in TEST_POSITIONS:
+                game = position_board(moves)
+                search.get_next_move(game.board, game.get_available_columns())
+                playouts[0] += search.last_stats.playouts if compact_tree else iterations
+
+        elapsed = best_time(run, repeat)
+        results[f"mcts.{name}.playouts_per_second"] = metric(playouts[0] / elapsed, "playouts/s", True)
+        search.close()
+    return results
+
+
+"""Exact solving of the late test positions, each one with an empty transposition table."""
+def benchmark_solver(repeat):
+    solver = ConnectFourSolver()
+    games = [position_board(moves) for moves in SOLVER_POSITIONS]
+    nodes = [0]
+
+    def solve():
+        nodes[0] = 0
+        for game in games:
+            solver.transposition_table.clear()
+            solver.nodes = 0
+            solver.solve(game.board)
+            nodes[0] += solver.nodes
+
+    elapsed = best_time(solve, repeat)
+    return {
+        "solver.positions_per_second": metric(len(games) / elapsed, "positions/s", True),
+        "solver.nodes_per_second": metric(nodes[0] / elapsed, "nodes/s", True),
+    }
+
+
+"""Random transitions for the Q table benchmarks: (state key, column, next state key, done)."""
+def random_transitions(games):
+    rng = random.Random(SEED)
+    transitions = []
+    game = ConnectFourGame()
+    for _ in range(games):
+        game.reset_board()
+        while True:
+            state = game.get_state_key()
+            column = rng.choice(game.get_available_columns())
+            game.drop_piece(column)
+            done = game.check_winner() is not None or game.is_full()
+            transitions.append((state, column, game.get_state_key(), done))
+            if done:
+                break
+    return transitions
+
+
+"""Q table updates and greedy move lookups."""
+def benchmark_q_table(games, repeat):
+    transitions = random_transitions(games)
+    agent = QLearningAlgorithm(epsilon=0.0)
+
+    def update():
+        agent.q_table = QTable()
+        for state, column, next_state, done in transitions:
+            agent.update_q_table(state, column, -0.1, next_state, done)
+
+    update_time = best_time(update, repeat)
+    available_columns = list(range(7))
+    states = [state for state, _, _, _ in transitions]
+
+    def lookup():
+        canonical_state = agent._canonical_state
+        best_action = agent._best_action
+        for state in states:
+            canonical, mirrored = canonical_state(state)
+            best_action(canonical, available_columns, mirrored)
+
+    lookup_time = best_time(lookup, repeat)
+    return {
+        "qtable.updates_per_second": metric(len(transitions) / update_time, "updates/s", True),
+        "qtable.lookups_per_second": metric(len(states) / lookup_time, "lookups/s", True),
+    }, agent
+
+
+"""Saving and loading of the Q table, the game log and the history index."""
+def benchmark_persistence(agent, games, repeat):
+    results = {}
+    rng = random.Random(SEED)
+    recorded_games = []
+    for _ in range(games):
+        moves = [((ply % 2) + 1, rng.randrange(7)) for ply in range(rng.randrange(7, 43))]
+        recorded_games.append((moves, rng.choice([1, 2, None])))
+
+    with tempfile.TemporaryDirectory() as directory:
+        q_table_file = os.path.join(directory, "q_table.bin")
+        results["persistence.q_table_save"] = metric(best_time(lambda: agent.q_table.save(q_table_file), repeat),
+                                                     "s", False)
+        results["persistence.q_table_load"] = metric(best_time(lambda: QTable.load(q_table_file), repeat),
+                                                     "s", False)
+
+        log_directory = os.path.join(directory, "game_history")
+
+        def append_games():
+            game_log = GameLog(log_directory)
+            for moves, winner in recorded_games:
+                game_log.append(moves, winner)
+            game_log.close()
+
+        start = time.perf_counter()
+        append_games()
+        results["persistence.game_log_append"] = metric(time.perf_counter() - start, "s", False)
+
+        index_file = os.path.join(directory, "history_index.json")
+        legacy_file = os.path.join(directory, "game_history.json")
+
+        def rebuild_index():
+            if os.path.exists(index_file):
+                os.remove(index_file)
+            HistoryIndex.load(index_file, log_directory, legacy_file)
+
+        results["persistence.history_index_rebuild"] = metric(best_time(rebuild_index, repeat), "s", False)
+        results["persistence.history_index_load"] = metric(
+            best_time(lambda: HistoryIndex.load(index_file, log_directory, legacy_file), repeat), "s", False)
+        index = HistoryIndex.load(index_file, log_directory, legacy_file)
+        results["persistence.history_index_save"] = metric(best_time(index.save, repeat), "s", False)
+    return results
+
+
+"""Runs all the benchmarks. quick runs smaller versions, for a fast check."""
+def run_benchmarks(quick=False, repeat=3):
+    scale = 0.1 if quick else 1.0
+    np.random.seed(SEED)
+    metrics = {}
+    metrics.update(benchmark_game(max(1, int(2000 * scale)), repeat))
+    metrics.update(benchmark_minimax(3 if quick else 5, repeat))
+    metrics.update(benchmark_mcts(max(10, int(1000 * scale)), repeat))
+    metrics.update(benchmark_solver(repeat))
+    q_table_metrics, agent = benchmark_q_table(max(1, int(5000 * scale)), repeat)
+    metrics.update(q_table_metrics)
+    metrics.update(benchmark_persistence(agent, max(1, int(20000 * scale)), repeat))
+    return {
+        "version": VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": quick,
+        "metrics": metrics,
+    }
+
+
+"""Compares the metrics of two benchmark results. Returns a list of
+(name, baseline value, current value, relative change, regression) rows, the change being
+positive when the metric got better."""
+def compare_results(baseline, current, threshold=0.1):
+    rows = []
+    for name, base in sorted(baseline["metrics"].items()):
+        if name not in current["metrics"]:
+            continue
+        base_value = base["value"]
+        value = current["metrics"][name]["value"]
+        if base_value == 0:
+            continue
+        change = (value - base_value) / base_value
+        if not base["higher_is_better"]:
+            change = -change
+        rows.append((name, base_value, value, change, change < -threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance benchmarks of the engine, the agents and the files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="runs the benchmarks")
+    run_parser.add_argument("--output", default="benchmark.json")
+    run_parser.add_argument("--quick", action="store_true", help="smaller benchmarks")
+    run_parser.add_argument("--repeat", type=int, default=3, help="the best of repeat runs is kept")
+    compare_parser = commands.add_parser("compare", help="compares results with a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="relative slowdown above which a metric is a regression")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run_benchmarks(args.quick, args.repeat)
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        for name, result in results["metrics"].items():
+            print(f"{name:45} {result['value']:14.4f} {result['unit']}")
+        print(f"Results saved in {args.output}")
+        return
+
+    with open(args.baseline, "r") as file:
+        baseline = json.load(file)
+    with open(args.current, "r") as file:
+        current = json.load(file)
+    if baseline.get("quick") != current.get("quick"):
+        print("Warning: comparing a quick run with a full run")
+    regressions = 0
+    for name, base_value, value, change, regression in compare_results(baseline, current, args.threshold):
+        flag = "REGRESSION" if regression else ""
+        print(f"{name:45} {base_value:14.4f} {value:14.4f} {change:+8.1%} {flag}")
+        regressions += regression
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# bitboard.py
+#
+# Bit layout (one bit per cell, one sentinel bit on top of every column):
+#
+#   .  .  .  .  .  .  .
+#   5 12 19 26 33 40 47
+#   4 11 18 25 32 39 46
+#   3 10 17 24 31 38 45
+#   2  9 16 23 30 37 44
+#   1  8 15 22 29 36 43
+#   0  7 14 21 28 35 42
+#
+# Row indexes used by the rest of the package (board[row][col]) count from the top,
+# bit rows count from the bottom.
+
+WIDTH = 7
+HEIGHT = 6
+COLUMN_BITS = HEIGHT + 1
+
+BOTTOM_MASK = sum(1 << (col * COLUMN_BITS) for col in range(WIDTH))
+BOARD_MASK = BOTTOM_MASK * ((1 << HEIGHT) - 1)
+COLUMN_MASKS = [((1 << HEIGHT) - 1) << (col * COLUMN_BITS) for col in range(WIDTH)]
+
+
+"""Returns the bit index of the cell board[row][col]."""
+def cell_bit(row, col):
+    return col * COLUMN_BITS + (HEIGHT - 1 - row)
+
+
+"""Returns the (row, col) cell of a bit index."""
+def bit_cell(bit):
+    col, height = divmod(bit, COLUMN_BITS)
+    return HEIGHT - 1 - height, col
+
+
+def _build_windows():
+    windows = []
+    for row in range(HEIGHT):
+        for col in range(WIDTH):
+            for d_row, d_col in ((0, 1), (1, 0), (1, 1), (-1, 1)):
+                cells = [(row + i * d_row, col + i * d_col) for i in range(4)]
+                if all(0 <= r < HEIGHT and 0 <= c < WIDTH for r, c in cells):
+                    windows.append(tuple(cell_bit(r, c) for r, c in cells))
+    return windows
+
+
+# The 69 four-cell windows of the board, as tuples of bit indexes and as masks
+WINDOWS = _build_windows()
+WINDOW_MASKS = [sum(1 << bit for bit in window) for window in WINDOWS]
+
+# For every bit index, the windows going through that cell
+WINDOWS_THROUGH = [[] for _ in range(WIDTH * COLUMN_BITS)]
+for _index, _window in enumerate(WINDOWS):
+    for _bit in _window:
+        WINDOWS_THROUGH[_bit].append(_index)
+WINDOW_MASKS_THROUGH = [[WINDOW_MASKS[index] for index in windows] for windows in WINDOWS_THROUGH]
+
+
+"""Returns True if the given pieces contain four in a row going through the bit index."""
+def wins_through(pieces, bit):
+    for mask in WINDOW_MASKS_THROUGH[bit]:
+        if pieces & mask == mask:
+            return True
+    return False
+
+
+"""Returns True if the given pieces contain four in a row anywhere on the board."""
+def has_four(pieces):
+    for shift in (1, COLUMN_BITS, COLUMN_BITS - 1, COLUMN_BITS + 1):
+        pairs = pieces & (pieces >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+"""Returns the key of the position seen in a mirror (columns reversed)."""
+def mirror_key(key):
+    column_mask = (1 << COLUMN_BITS) - 1
+    mirrored = 0
+    for col in range(WIDTH):
+        mirrored = (mirrored << COLUMN_BITS) | ((key >> (col * COLUMN_BITS)) & column_mask)
+    return mirrored
+
+
+"""Returns the key of a board[row][col] grid, the same as BitBoard.from_grid(grid).key()."""
+def grid_key(grid):
+    key = BOTTOM_MASK
+    for col in range(WIDTH):
+        bit = col * COLUMN_BITS
+        for row in range(HEIGHT - 1, -1, -1):
+            piece = grid[row][col]
+            if piece == 0:
+                break
+            key += (2 << bit) if piece == 1 else (1 << bit)
+            bit += 1
+    return key
+
+
+class BitBoard:
+    """Connect 4 position stored as one integer per player plus the height of every column.
+
+    pieces[1] and pieces[2] hold the bits of each player, heights[col] is the bit index
+    of the next free cell of the column. play() and undo() are O(1)."""
+
+    __slots__ = ("pieces", "heights", "history")
+
+    def __init__(self):
+        self.pieces = [0, 0, 0]
+        self.heights = [col * COLUMN_BITS for col in range(WIDTH)]
+        self.history = []
+
+    """Builds a bitboard from a 6x7 list of lists (row 0 at the top, 0 for an empty cell)."""
+    @classmethod
+    def from_grid(cls, grid):
+        bitboard = cls()
+        for col in range(WIDTH):
+            for row in reversed(range(HEIGHT)):
+                piece = grid[row][col]
+                if piece == 0:
+                    break
+                bitboard.pieces[piece] |= 1 << bitboard.heights[col]
+                bitboard.heights[col] += 1
+        return bitboard
+
+    def copy(self):
+        bitboard = BitBoard.__new__(BitBoard)
+        bitboard.pieces = self.pieces[:]
+        bitboard.heights = self.heights[:]
+        bitboard.history = self.history[:]
+        return bitboard
+
+    """Returns True if the column is not full."""
+    def can_play(self, column):
+        return self.heights[column] < column * COLUMN_BITS + HEIGHT
+
+    def legal_moves(self):
+        return [col for col in range(WIDTH) if self.heights[col] < col * COLUMN_BITS + HEIGHT]
+
+    """Drops a piece of the player in the column and returns the bit index it landed on."""
+    def play(self, column, player):
+        bit = self.heights[column]
+        self.pieces[player] |= 1 << bit
+        self.heights[column] = bit + 1
+        self.history.append((column, player))
+        return bit
+
+    """Takes back the last move and returns its (column, player)."""
+    def undo(self):
+        column, player = self.history.pop()
+        self.heights[column] -= 1
+        self.pieces[player] ^= 1 << self.heights[column]
+        return column, player
+
+    """Returns True if the piece on the bit index completes four in a row for the player."""
+    def is_winning_bit(self, player, bit):
+        return wins_through(self.pieces[player], bit)
+
+    """Returns True if playing the column would make the player win."""
+    def is_winning_move(self, column, player):
+        bit = self.heights[column]
+        return wins_through(self.pieces[player] | (1 << bit), bit)
+
+    def mask(self):
+        return self.pieces[1] | self.pieces[2]
+
+    def move_count(self):
+        return bin(self.pieces[1] | self.pieces[2]).count("1")
+
+    def is_full(self):
+        return self.mask() == BOARD_MASK
+
+    """Returns a unique integer for the position (49 bits), independent of the move order."""
+    def key(self):
+        return self.pieces[1] + (self.pieces[1] | self.pieces[2]) + BOTTOM_MASK
+
+    def to_grid(self):
+        grid = [[0 for _ in range(WIDTH)] for _ in range(HEIGHT)]
+        for player in (1, 2):
+            pieces = self.pieces[player]
+            while pieces:
+                low = pieces & -pieces
+                row, col = bit_cell(low.bit_length() - 1)
+                grid[row][col] = player
+                pieces ^= low
+        return grid
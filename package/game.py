@@ -1,64 +1,73 @@
 import random
 
+from .bitboard import BitBoard, HEIGHT, WIDTH, COLUMN_BITS
+
 
 class ConnectFourGame:
     def __init__(self):
         self.board = [[0 for _ in range(7)] for _ in range(6)]
+        self.bitboard = BitBoard()
         self.current_player = 1
         self.moves = []
+        self.winner = None
 
     """Returns True if the piece was successfully dropped, False otherwise."""
     def drop_piece(self, column):
         if column is None:
-            available_columns = [i for i in range(7) if self.board[0][i] == 0]
+            available_columns = self.get_available_columns()
             if not available_columns:
                 return False  # Aucun mouvement possible
             column = random.choice(available_columns)
-        for row in reversed(range(6)):
-            if self.board[row][column] == 0:
-                self.board[row][column] = self.current_player
-                self.moves.append((self.current_player, column))
-                if not self.check_winner():
-                    self.switch_player()
-                return True
-        return False
+        if not self.bitboard.can_play(column):
+            return False
+        bit = self.bitboard.play(column, self.current_player)
+        self.board[HEIGHT - 1 - (bit - column * COLUMN_BITS)][column] = self.current_player
+        self.moves.append((self.current_player, column))
+        # Only the lines going through the new piece can have been completed
+        if self.bitboard.is_winning_bit(self.current_player, bit):
+            self.winner = self.current_player
+        else:
+            self.switch_player()
+        return True
+
+    """Takes back the last move. Returns False if there is no move to take back."""
+    def undo_move(self):
+        if not self.moves:
+            return False
+        column, player = self.bitboard.undo()
+        self.board[HEIGHT - 1 - (self.bitboard.heights[column] - column * COLUMN_BITS)][column] = 0
+        self.moves.pop()
+        self.current_player = player
+        self.winner = None
+        return True
 
     def get_all_moves(self):
         return self.moves
 
+    """Returns the columns that are not full."""
+    def get_available_columns(self):
+        return self.bitboard.legal_moves()
+
+    """Returns a compact integer identifying the position."""
+    def get_state_key(self):
+        return self.bitboard.key()
+
     """Switches the current player."""
     def switch_player(self):
         self.current_player = 3 - self.current_player
 
     """ Returns the winner if there is one, None otherwise. """
     def check_winner(self):
-        for row in range(6):
-            for col in range(4):
-                if self.board[row][col] == self.current_player and all(self.board[row][col+i] == self.current_player for i in range(4)):
-                    return self.current_player
-
-        for col in range(7):
-            for row in range(3):
-                if self.board[row][col] == self.current_player and all(self.board[row+i][col] == self.current_player for i in range(4)):
-                    return self.current_player
-
-        for col in range(4):
-            for row in range(3, 6):
-                if self.board[row][col] == self.current_player and all(self.board[row-i][col+i] == self.current_player for i in range(4)):
-                    return self.current_player
-
-        for col in range(4):
-            for row in range(3):
-                if self.board[row][col] == self.current_player and all(self.board[row+i][col+i] == self.current_player for i in range(4)):
-                    return self.current_player
-        return None
+        return self.winner
 
     """Returns True if the board is full, False otherwise."""
     def is_full(self):
-        return all(self.board[0][col] != 0 for col in range(7))
+        return len(self.moves) == WIDTH * HEIGHT
 
     """Resets the board."""
     def reset_board(self):
         self.board = [[0 for _ in range(7)] for _ in range(6)]
+        self.bitboard = BitBoard()
         self.current_player = 1
-        self.moves = []
\ No newline at end of file
+        self.moves = []
+        self.winner = None
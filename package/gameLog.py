@@ -0,0 +1,113 @@
+# gameLog.py
+#
+# Append-only game history: one JSON object per line ({"moves": [[player, column], ...], "winner": 1, 2 or null})
+# in segment files game_history/segment-000001.jsonl, game_history/segment-000002.jsonl, ...
+# A new segment is started when the current one reaches segment_bytes.
+# A position in the log is (segment number, byte offset in the segment).
+import json
+import os
+
+GAME_LOG_DIRECTORY = "game_history"
+HISTORY_FILE = "game_history.json"  # former format: a single JSON list rewritten after every game
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+def _segment_files(directory):
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    segments = sorted(name for name in names if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+    return [os.path.join(directory, name) for name in segments]
+
+
+def _segment_number(filename):
+    return int(os.path.basename(filename)[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+
+"""Returns the position of the end of the log."""
+def log_end_position(directory=GAME_LOG_DIRECTORY):
+    segments = _segment_files(directory)
+    if not segments:
+        return 1, 0
+    return _segment_number(segments[-1]), os.path.getsize(segments[-1])
+
+
+class GameLog:
+    """Writes finished games at the end of the log. Games are kept in memory and written
+    flush_every at a time, so the cost of recording a game does not depend on the size of the history."""
+
+    def __init__(self, directory=GAME_LOG_DIRECTORY, flush_every=10, segment_bytes=16 * 1024 * 1024):
+        self.directory = directory
+        self.flush_every = flush_every
+        self.segment_bytes = segment_bytes
+        self.buffer = []
+        segments = _segment_files(directory)
+        self.segment_number = _segment_number(segments[-1]) if segments else 1
+
+    def segment_file(self):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{self.segment_number:06d}{SEGMENT_SUFFIX}")
+
+    """Adds a finished game: moves is the list of (player, column), winner None for a draw.
+    Returns True if the buffered games have been written."""
+    def append(self, moves, winner):
+        game = {"moves": [[int(player), int(column)] for player, column in moves],
+                "winner": int(winner) if winner is not None else None}
+        self.buffer.append(json.dumps(game, separators=(",", ":")) + "\n")
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+            return True
+        return False
+
+    """Writes the buffered games, starting a new segment if the current one is full."""
+    def flush(self):
+        if not self.buffer:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        filename = self.segment_file()
+        if os.path.exists(filename) and os.path.getsize(filename) >= self.segment_bytes:
+            self.segment_number += 1
+            filename = self.segment_file()
+        # A game cut by a crash is left on a line of its own instead of corrupting the next one
+        torn = False
+        if os.path.exists(filename) and os.path.getsize(filename):
+            with open(filename, "rb") as file:
+                file.seek(-1, os.SEEK_END)
+                torn = file.read(1) != b"\n"
+        with open(filename, "a") as file:
+            if torn:
+                file.write("\n")
+            file.writelines(self.buffer)
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+
+
+"""Yields the recorded games one by one, oldest first: the games of the former game_history.json
+file if it is still there, then the games of the log segments. Lines that cannot be read, such as
+a game cut by a crash, are skipped.
+With a start position (see log_end_position), only the games of the log written after it are read."""
+def read_games(directory=GAME_LOG_DIRECTORY, legacy_file=HISTORY_FILE, start=None):
+    if start is None and os.path.exists(legacy_file):
+        with open(legacy_file, "r") as file:
+            yield from json.load(file)
+
+    start_segment, start_offset = start if start is not None else (0, 0)
+    for filename in _segment_files(directory):
+        segment_number = _segment_number(filename)
+        if segment_number < start_segment:
+            continue
+        with open(filename, "rb") as file:
+            if segment_number == start_segment:
+                file.seek(start_offset)
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    game = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    print(f"Skipping an unreadable game in {filename}: {line.strip()[:40].decode(errors='replace')}")
+                    continue
+                yield game
@@ -1,14 +1,27 @@
 # gui.py
-import json
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import messagebox
 
-from package.reinforcement.qLearning import QLearningAlgorithm
+from package.gameLog import GameLog
+from package.historyIndex import HistoryIndex
+from package.agents import update_learning_agent
+from package.reinforcement.qLearning import calculate_reward
 from .game import ConnectFourGame
 
+# Milliseconds between two checks of the result of the AI move in progress
+POLL_INTERVAL = 20
+TURBO_POLL_INTERVAL = 1
+
+PIECE_COLORS = ["white", "red", "yellow"]
+
 
 class ConnectFourGUI:
-    def __init__(self, master, player1_algorithm=None, player2_algorithm=None, num_games=1):
+    """In turbo mode the AI moves follow each other without delay and the board is only drawn
+    every render_every moves (0: only the final position of every game). It only applies when
+    both players are AIs."""
+    def __init__(self, master, player1_algorithm=None, player2_algorithm=None, num_games=1, turbo=False,
+                 render_every=0):
         self.master = master
         self.master.title("Connect 4")
         self.game = ConnectFourGame()
@@ -23,7 +36,18 @@ class ConnectFourGUI:
         self.on_close_callbacks = []
         self.num_games = num_games
         self.games_played = 0
-        self.sleeptime = 100
+        self.turbo = turbo and player1_algorithm is not None and player2_algorithm is not None
+        self.render_every = render_every if self.turbo else 1
+        self.moves_since_render = 0
+        self.sleeptime = 0 if self.turbo else 100
+        self.poll_interval = TURBO_POLL_INTERVAL if self.turbo else POLL_INTERVAL
+        self.history_index = HistoryIndex.load()
+        self.game_log = GameLog()
+        # The AI moves are computed in a worker thread so that the window stays responsive
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending_move = None  # (search id, agent, future) of the AI move in progress
+        self.search_id = 0
+        self.closed = False
 
         # Initiates the first move if both players are AIs
         if self.player1_algorithm is not None and self.player2_algorithm is not None:
@@ -31,27 +55,24 @@ class ConnectFourGUI:
 
     def record_game_data(self, winner):
         moves = [(player, int(move)) for player, move in self.game.get_all_moves()]
-        new_game_data = {
-            "moves": moves,
-            "winner": int(winner) if winner is not None else None
-        }
-
-        try:
-            with open("game_history.json", "r") as file:
-                game_history = json.load(file)
-        except FileNotFoundError:
-            game_history = []
-
-        game_history.append(new_game_data)
-
-        with open("game_history.json", "w") as file:
-            json.dump(game_history, file, indent=4)
+        winner = int(winner) if winner is not None else None
+        self.history_index.record_game(moves, winner)
+        # The index is saved with the games it counts
+        if self.game_log.append(moves, winner):
+            self.history_index.save()
 
     def add_on_close_callback(self, callback):
         self.on_close_callbacks.append(callback)
 
     def close(self):
         print("Closing the application and calling callbacks")
+        self.closed = True
+        self.cancel_ai_move()
+        self.stop_pondering()
+        # Waits for the stopped search, the agents are saved by the callbacks
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.game_log.close()
+        self.history_index.save()
         for callback in self.on_close_callbacks:
             callback()
         self.master.destroy()
@@ -67,6 +88,8 @@ class ConnectFourGUI:
 
     """Draws the board."""
     def draw_board(self):
+        # Color of every cell as drawn on the canvas
+        self.cell_colors = [["white"] * 7 for _ in range(6)]
         self.board_circles = []
         for row in range(6):
             row_circles = []
@@ -75,49 +98,100 @@ class ConnectFourGUI:
                 row_circles.append(circle)
             self.board_circles.append(row_circles)
 
-    """Drops a piece in the given column."""
+    """Drops a piece in the given column, or starts the move of the AI whose turn it is.
+    Clicks are ignored while an AI is thinking or when it is an AI's turn."""
     def drop_piece(self, col):
-        available_columns = [i for i in range(7) if self.game.board[0][i] == 0]
-        # Current state before playing
-        current_state = str(self.game.board)
-        if self.player1_algorithm is not None and self.game.current_player == 1:
-            # Player 1 is an AI
-            column = self.player1_algorithm.get_next_move(self.game.board, available_columns)
-        elif self.player2_algorithm is not None and self.game.current_player == 2:
-            # Player 2 is an AI
-            column = self.player2_algorithm.get_next_move(self.game.board, available_columns)
-        else:
+        if self.closed or self.pending_move is not None:
+            return
+        agent = self.current_agent()
+        if agent is not None:
+            self.start_ai_move(agent)
+        elif col is not None:
             # Players are human
-            column = col
+            self.play_move(col)
+
+    def current_agent(self):
+        return self.player1_algorithm if self.game.current_player == 1 else self.player2_algorithm
+
+    """Computes the move of the agent in the worker thread, the Tk loop polls for the result."""
+    def start_ai_move(self, agent):
+        self.search_id += 1
+        board = [row[:] for row in self.game.board]
+        # Cleared here rather than by the search, which would lose a cancel sent before it starts
+        if hasattr(agent, "clear_stop"):
+            agent.clear_stop()
+        future = self.executor.submit(agent.get_next_move, board, self.game.get_available_columns())
+        self.pending_move = (self.search_id, agent, future)
+        self.master.after(self.poll_interval, self.poll_ai_move, self.search_id)
+
+    def poll_ai_move(self, search_id):
+        if self.closed or self.pending_move is None or self.pending_move[0] != search_id:
+            # The move has been cancelled
+            return
+        future = self.pending_move[2]
+        if not future.done():
+            self.master.after(self.poll_interval, self.poll_ai_move, search_id)
+            return
+        self.pending_move = None
+        try:
+            column = future.result()
+        except Exception as e:
+            print(f"The search of the AI failed: {e}")
+            return
+        self.play_move(column)
+
+    """Cancels the AI move in progress: its search is asked to stop and its result is ignored."""
+    def cancel_ai_move(self):
+        if self.pending_move is None:
+            return
+        _, agent, future = self.pending_move
+        self.pending_move = None
+        future.cancel()
+        if hasattr(agent, "stop_search"):
+            agent.stop_search()
+
+    """Plays the move of the current player."""
+    def play_move(self, column):
+        # Current state before playing
+        current_state = self.game.get_state_key()
 
         if self.game.drop_piece(column):
-            self.update_board()
             print(f"drop_piece called for column {column}")
 
             winner = self.game.check_winner()
-            done = winner is not None or self.game.is_full()
+            self.render_move(column, winner is not None or self.game.is_full())
 
             # Update of table Q only if the agent is of type QLearningAlgorithm
-            current_player_agent = self.player1_algorithm if self.game.current_player == 1 else self.player2_algorithm
-            if isinstance(current_player_agent, QLearningAlgorithm):
-                reward = self.calculate_reward_qLearning(winner, done)
-                next_state = self.game.board
-                action = column
-                current_player_agent.update_q_table(current_state, action, reward, next_state, done)
+            update_learning_agent(self.game, self.player1_algorithm, self.player2_algorithm, current_state, column)
 
             if winner:
                 self.handle_game_over(winner)
+                return
             elif self.game.is_full():
                 self.handle_game_over(None)
+                return
 
             # Check so that the AI automatically plays after the previous player
-            if self.player1_algorithm is not None and self.game.current_player == 1:
-                # Recursive call so that the AI plays automatically after a one-second pause
+            if self.current_agent() is not None:
                 self.master.after(self.sleeptime, self.drop_piece, None)
-            if self.player2_algorithm is not None and self.game.current_player == 2:
-                # Recursive call so that the AI plays automatically after a one-second pause
-                self.master.after(self.sleeptime, self.drop_piece, None)
-
+            else:
+                # The AI that has just played searches while the human thinks
+                previous_agent = self.player2_algorithm if self.game.current_player == 1 else self.player1_algorithm
+                if hasattr(previous_agent, "start_pondering"):
+                    previous_agent.start_pondering([row[:] for row in self.game.board])
+
+    """Stops the pondering of the agents."""
+    def stop_pondering(self):
+        for agent in (self.player1_algorithm, self.player2_algorithm):
+            if hasattr(agent, "stop_pondering"):
+                agent.stop_pondering()
+
+    """Starts a new game, cancelling the AI move in progress and the pondering."""
+    def reset_game(self):
+        self.cancel_ai_move()
+        self.stop_pondering()
+        self.game.reset_board()
+        self.update_board()
 
     """Handles the end of the game."""
     def handle_game_over(self, winner):
@@ -145,8 +219,7 @@ class ConnectFourGUI:
             # If both players are AIs, check whether the number of games played is less than the total number of games to be played
             if self.games_played < self.num_games:
                 # Resets the board for a new game
-                self.game.reset_board()
-                self.update_board()
+                self.reset_game()
 
                 # Automatically start the next game
                 print("Game number: ", self.games_played)
@@ -164,37 +237,45 @@ class ConnectFourGUI:
     def display_game_over_message(self, message):
         restart = tk.messagebox.askyesno("Restart", message + " Would you like to start a new game?")
         if restart:
-            self.game.reset_board()
-            self.update_board()
+            self.reset_game()
+            # The AI starts the new game if it is player 1
+            if self.current_agent() is not None:
+                self.master.after(self.sleeptime, self.drop_piece, None)
         else:
             self.close()
 
-    """Updates the board."""
+    """Updates the board: only the cells whose color has changed are redrawn."""
     def update_board(self):
         for row in range(6):
             for col in range(7):
-                piece = self.game.board[row][col]
-                color = "white"
-                if piece == 1:
-                    color = "red"
-                elif piece == 2:
-                    color = "yellow"
-
-                self.canvas.itemconfig(self.board_circles[row][col], fill=color)
+                self.draw_cell(row, col)
+        self.moves_since_render = 0
         self.master.update_idletasks() #lorsque deux minmax jouent plusieurs parties, le canvas ne se met pas à jour sans
 
+    def draw_cell(self, row, col):
+        color = PIECE_COLORS[self.game.board[row][col]]
+        if self.cell_colors[row][col] != color:
+            self.cell_colors[row][col] = color
+            self.canvas.itemconfig(self.board_circles[row][col], fill=color)
+
+    """Draws the move played in the column, or only counts it when frames are skipped.
+    The final position of a game is always drawn."""
+    def render_move(self, column, game_over):
+        self.moves_since_render += 1
+        if game_over or (self.render_every and self.moves_since_render >= self.render_every):
+            if self.moves_since_render == 1:
+                # Only the cell of the new piece has changed
+                row = next(row for row in range(6) if self.game.board[row][column] != 0)
+                self.draw_cell(row, column)
+                self.moves_since_render = 0
+                self.master.update_idletasks()
+            else:
+                self.update_board()
+
 
     """Calculates the reward for the current player. Only used for reinforcement learning."""
     def calculate_reward_qLearning(self, winner, done):
-        if winner == self.game.current_player:
-            # Reward to win
-            return 1
-        elif done:
-            # Neutral reward for a draw
-            return 0
-        else:
-            # Small penalty to continue play
-            return -0.1
+        return calculate_reward(winner, done, self.game.current_player)
 
 
 def main():
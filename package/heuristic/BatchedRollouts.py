@@ -0,0 +1,81 @@
+import numpy as np
+
+from package.bitboard import WIDTH, HEIGHT, COLUMN_BITS, WINDOW_MASKS_THROUGH
+
+# Value of every bit index
+BIT_VALUES = np.array([1 << bit for bit in range(WIDTH * COLUMN_BITS)], dtype=np.uint64)
+
+# Masks of the windows going through every bit index, padded to the same length with the
+# sentinel bit of the first column, which is never set: the padding windows can never be complete
+_PADDING_MASK = 1 << HEIGHT
+_MAX_WINDOWS = max(len(masks) for masks in WINDOW_MASKS_THROUGH)
+LINE_MASKS = np.array([masks + [_PADDING_MASK] * (_MAX_WINDOWS - len(masks)) for masks in WINDOW_MASKS_THROUGH],
+                      dtype=np.uint64)
+
+# Bit index of the cell above the top of every column
+COLUMN_TOPS = np.array([col * COLUMN_BITS + HEIGHT for col in range(WIDTH)], dtype=np.int64)
+
+
+class BatchedRollouts:
+    """Plays many random games at once as NumPy arrays.
+
+    Every game is a pair of bitboards (pieces of the player to move, pieces of the other player)
+    and the column heights. At each step all the running games play a random legal move and
+    the windows through the new pieces are tested for four in a row."""
+
+    def __init__(self, playouts_per_leaf=256, seed=None):
+        self.playouts_per_leaf = playouts_per_leaf
+        self.rng = np.random.default_rng(seed)
+
+    """Plays playouts_per_leaf random games from every (bitboard, player to move) position.
+    Returns an int array of shape (positions, 3): draws, wins of player 1, wins of player 2."""
+    def run(self, positions):
+        playouts = self.playouts_per_leaf
+        games = len(positions) * playouts
+
+        current = np.empty(games, dtype=np.uint64)
+        other = np.empty(games, dtype=np.uint64)
+        heights = np.empty((games, WIDTH), dtype=np.int64)
+        mover = np.empty(games, dtype=np.int8)
+        for index, (bitboard, player) in enumerate(positions):
+            games_slice = slice(index * playouts, (index + 1) * playouts)
+            current[games_slice] = bitboard.pieces[player]
+            other[games_slice] = bitboard.pieces[3 - player]
+            heights[games_slice] = bitboard.heights
+            mover[games_slice] = player
+
+        winners = np.zeros(games, dtype=np.int8)
+        running = np.arange(games)
+        while running.size:
+            game_heights = heights[running]
+            legal = game_heights < COLUMN_TOPS
+            has_move = legal.any(axis=1)
+            # Full boards are draws
+            running = running[has_move]
+            if not running.size:
+                break
+            game_heights = game_heights[has_move]
+            legal = legal[has_move]
+
+            # Random legal column: the highest random key among the legal columns
+            keys = self.rng.random(legal.shape)
+            keys[~legal] = -1.0
+            columns = keys.argmax(axis=1)
+            bits = game_heights[np.arange(running.size), columns]
+            heights[running, columns] = bits + 1
+
+            pieces = current[running] | BIT_VALUES[bits]
+            masks = LINE_MASKS[bits]
+            won = ((pieces[:, None] & masks) == masks).any(axis=1)
+            winners[running[won]] = mover[running[won]]
+
+            # The other player moves next
+            current[running] = other[running]
+            other[running] = pieces
+            mover[running] = 3 - mover[running]
+            running = running[~won]
+
+        results = np.zeros((len(positions), 3), dtype=np.int64)
+        for player in range(3):
+            results[:, player] = (winners.reshape(len(positions), playouts) == player).sum(axis=1)
+        return results
@@ -0,0 +1,264 @@
+import math
+import random
+from array import array
+
+from package.bitboard import BitBoard, WIDTH, HEIGHT
+
+EXPLORATION_PARAM = math.sqrt(2)
+HISTORICAL_BIAS = 0.15  # Adjust this value depending on the accuracy of the game in the game_history.json
+
+# Values of the results array
+NOT_TERMINAL = 0
+DRAW = 3
+
+# Wins of player 1 and player 2 (indexed by player) for one playout won by the key (0 for a draw)
+RESULT_WINS = {0: (0, 0, 0), 1: (0, 1, 0), 2: (0, 0, 1)}
+
+
+"""Plays random moves from the position until the game ends. Returns the winner, or 0 for a draw.
+The bitboard is modified."""
+def random_playout(bitboard, player):
+    while True:
+        moves = bitboard.legal_moves()
+        if not moves:
+            return 0
+        bit = bitboard.play(random.choice(moves), player)
+        if bitboard.is_winning_bit(player, bit):
+            return player
+        player = 3 - player
+
+
+class CompactMonteCarloTree:
+    """Monte-Carlo search tree stored in preallocated typed arrays instead of one object per node.
+
+    A node is an index. Boards are not stored: the position of a node is rebuilt on a BitBoard
+    by playing the moves of its path from the root. The wins of a node are counted for the
+    player who played the move leading to it."""
+
+    def __init__(self, capacity=200000):
+        self.capacity = capacity
+        self.visits = array('d', [0.0]) * capacity
+        self.wins = array('d', [0.0]) * capacity
+        self.parents = array('i', [-1]) * capacity
+        self.moves = array('b', [-1]) * capacity
+        self.players = array('b', [0]) * capacity
+        self.results = array('b', [NOT_TERMINAL]) * capacity
+        self.untried = array('B', [0]) * capacity  # bit i set if column i has not been expanded yet
+        self.children = array('i', [-1]) * (capacity * WIDTH)
+        self.size = 0
+        self.root = -1
+        self.root_bitboard = None
+        self.root_player = 1
+        self.root_ply = 0
+        self.priors = [[0.0] * WIDTH for _ in range(WIDTH * HEIGHT)]
+
+    """Starts a new tree on the board (6x7 list of lists) with the player to move."""
+    def set_root(self, board, player):
+        bitboard = board if isinstance(board, BitBoard) else BitBoard.from_grid(board)
+        self.size = 0
+        self.root_bitboard = bitboard
+        self.root_player = player
+        self.root_ply = bitboard.move_count()
+        self.root = self.add_node(-1, -1, 3 - player, bitboard)
+
+    """Moves the root down to the node holding the position of the bitboard, among the descendants of
+    the root down to max_depth plies, and keeps the statistics of its subtree.
+    Returns False if the position is not in the tree."""
+    def advance_root(self, bitboard, player, max_depth=2):
+        if self.root < 0:
+            return False
+        key = bitboard.key()
+        level = [(self.root, self.root_bitboard, self.root_player)]
+        for depth in range(max_depth + 1):
+            next_level = []
+            for node, node_bitboard, node_player in level:
+                if node_player == player and node_bitboard.key() == key:
+                    self.reroot(node)
+                    self.root_bitboard = node_bitboard
+                    self.root_ply = node_bitboard.move_count()
+                    return True
+                base = node * WIDTH
+                for col in range(WIDTH):
+                    child = self.children[base + col]
+                    if child >= 0:
+                        child_bitboard = node_bitboard.copy()
+                        child_bitboard.play(col, node_player)
+                        next_level.append((child, child_bitboard, 3 - node_player))
+            level = next_level
+        return False
+
+    """Makes the node the root and moves its subtree to the start of the arrays.
+    Children always have a higher index than their parent, so copying the nodes of the subtree
+    in increasing index order never overwrites a node that has not been copied yet."""
+    def reroot(self, root):
+        subtree = [root]
+        stack = [root]
+        while stack:
+            base = stack.pop() * WIDTH
+            for col in range(WIDTH):
+                child = self.children[base + col]
+                if child >= 0:
+                    subtree.append(child)
+                    stack.append(child)
+        subtree.sort()
+        new_indexes = {old: new for new, old in enumerate(subtree)}
+
+        for new, old in enumerate(subtree):
+            self.visits[new] = self.visits[old]
+            self.wins[new] = self.wins[old]
+            self.parents[new] = new_indexes.get(self.parents[old], -1) if old != root else -1
+            self.moves[new] = self.moves[old]
+            self.players[new] = self.players[old]
+            self.results[new] = self.results[old]
+            self.untried[new] = self.untried[old]
+            new_base, old_base = new * WIDTH, old * WIDTH
+            for col in range(WIDTH):
+                child = self.children[old_base + col]
+                self.children[new_base + col] = new_indexes[child] if child >= 0 else -1
+        self.size = len(subtree)
+        self.root = 0
+        self.root_player = 3 - self.players[0]
+
+    """Sets the bonus added to the selection value of every (ply, column) from a HistoryIndex."""
+    def set_priors(self, history_index):
+        self.priors = [[HISTORICAL_BIAS * history_index.win_rate(ply, col) for col in range(WIDTH)]
+                       for ply in range(WIDTH * HEIGHT)]
+
+    """Allocates a node. bitboard is the position of the node, player the one who moved to it."""
+    def add_node(self, parent, move, player, bitboard, won=False):
+        node = self.size
+        self.size += 1
+        self.visits[node] = 0.0
+        self.wins[node] = 0.0
+        self.parents[node] = parent
+        self.moves[node] = move
+        self.players[node] = player
+        base = node * WIDTH
+        for col in range(WIDTH):
+            self.children[base + col] = -1
+        if won:
+            self.results[node] = player
+            self.untried[node] = 0
+        elif bitboard.is_full():
+            self.results[node] = DRAW
+            self.untried[node] = 0
+        else:
+            self.results[node] = NOT_TERMINAL
+            untried = 0
+            for col in bitboard.legal_moves():
+                untried |= 1 << col
+            self.untried[node] = untried
+        if parent >= 0:
+            self.children[parent * WIDTH + move] = node
+        return node
+
+    def is_full(self):
+        return self.size >= self.capacity
+
+    """Returns the child of the node with the highest UCB1 value. ply is the number of pieces of the node."""
+    def select_child(self, node, ply):
+        visits, wins, priors = self.visits, self.wins, self.priors[ply]
+        log_visits = math.log(visits[node]) if visits[node] > 0 else 0.0
+        best_child = -1
+        best_value = -float('inf')
+        base = node * WIDTH
+        for col in range(WIDTH):
+            child = self.children[base + col]
+            if child < 0:
+                continue
+            if visits[child] == 0:
+                return child
+            value = (wins[child] / visits[child] + EXPLORATION_PARAM * math.sqrt(log_visits / visits[child])
+                     + priors[col])
+            if value > best_value:
+                best_value = value
+                best_child = child
+        return best_child
+
+    """Goes down the tree from the root while the nodes are fully expanded.
+    Returns the node reached, its position and the player to move there."""
+    def select(self):
+        node = self.root
+        bitboard = self.root_bitboard.copy()
+        player = self.root_player
+        ply = self.root_ply
+        while self.untried[node] == 0 and self.results[node] == NOT_TERMINAL:
+            node = self.select_child(node, ply)
+            bitboard.play(self.moves[node], player)
+            player = 3 - player
+            ply += 1
+        return node, bitboard, player
+
+    """Adds one random untried child to the node. Returns the new node and the player to move there,
+    or the node itself if it cannot be expanded."""
+    def expand(self, node, bitboard, player):
+        untried = self.untried[node]
+        if not untried or self.is_full():
+            return node, player
+        moves = [col for col in range(WIDTH) if untried & (1 << col)]
+        move = random.choice(moves)
+        self.untried[node] = untried & ~(1 << move)
+        bit = bitboard.play(move, player)
+        child = self.add_node(node, move, player, bitboard, bitboard.is_winning_bit(player, bit))
+        return child, 3 - player
+
+    """Returns the winner of a playout from the node (0 for a draw)."""
+    def simulate(self, node, bitboard, player):
+        result = self.results[node]
+        if result != NOT_TERMINAL:
+            return 0 if result == DRAW else result
+        return random_playout(bitboard, player)
+
+    """Adds the playout results to the node and its ancestors. wins is the number of playouts won
+    by player 1 and by player 2, as a list indexed by player."""
+    def backpropagate(self, node, wins, playouts=1):
+        while node >= 0:
+            self.visits[node] += playouts
+            self.wins[node] += wins[self.players[node]]
+            node = self.parents[node]
+
+    """Adds visits without wins on the path of the node, so that other selections avoid it
+    while its playout is running. A negative amount removes them."""
+    def add_virtual_loss(self, node, amount):
+        while node >= 0:
+            self.visits[node] += amount
+            node = self.parents[node]
+
+    """Scores the node. With a BatchedRollouts engine, the node is scored with all the playouts
+    of the batch instead of a single one. Returns the wins indexed by player and the number of playouts."""
+    def playout(self, node, bitboard, player, rollouts=None):
+        if rollouts is None:
+            return RESULT_WINS[self.simulate(node, bitboard, player)], 1
+        playouts = rollouts.playouts_per_leaf
+        if self.results[node] != NOT_TERMINAL:
+            return [playouts * wins for wins in RESULT_WINS[self.simulate(node, bitboard, player)]], playouts
+        return rollouts.run([(bitboard, player)])[0].tolist(), playouts
+
+    """Runs one select/expand/simulate/backpropagate iteration."""
+    def iterate(self, rollouts=None):
+        node, bitboard, player = self.select()
+        node, player = self.expand(node, bitboard, player)
+        wins, playouts = self.playout(node, bitboard, player, rollouts)
+        self.backpropagate(node, wins, playouts)
+
+    """Returns the (move, wins, visits) of the root children."""
+    def root_statistics(self):
+        statistics = []
+        base = self.root * WIDTH
+        for col in range(WIDTH):
+            child = self.children[base + col]
+            if child >= 0:
+                statistics.append((col, self.wins[child], self.visits[child]))
+        return statistics
+
+    """Returns the root move with the highest win ratio."""
+    def best_move(self):
+        best_win_ratio = -float('inf')
+        best_move = None
+        for move, wins, visits in self.root_statistics():
+            win_ratio = wins / visits if visits > 0 else 0
+            if win_ratio > best_win_ratio:
+                best_win_ratio = win_ratio
+                best_move = move
+        return best_move
+
@@ -0,0 +1,73 @@
+class MonteCarloStatistics:
+    """Statistics of one MonteCarloTreeSearch.get_next_move call.
+
+    Phase times are in seconds. With root parallelization they are added up over the workers,
+    so they can exceed the elapsed time."""
+
+    def __init__(self):
+        self.iterations = 0
+        self.playouts = 0
+        self.nodes_allocated = 0
+        self.tree_size = 0
+        self.reused_nodes = 0
+        self.max_depth = 0
+        self.total_depth = 0
+        self.elapsed = 0.0
+        self.selection_time = 0.0
+        self.expansion_time = 0.0
+        self.simulation_time = 0.0
+        self.backpropagation_time = 0.0
+        self.book_move = False
+
+    """Records one iteration: depth of the scored node, number of playouts and phase durations."""
+    def record_iteration(self, depth, playouts, selection_time, expansion_time, simulation_time,
+                         backpropagation_time):
+        self.iterations += 1
+        self.playouts += playouts
+        self.total_depth += depth
+        if depth > self.max_depth:
+            self.max_depth = depth
+        self.selection_time += selection_time
+        self.expansion_time += expansion_time
+        self.simulation_time += simulation_time
+        self.backpropagation_time += backpropagation_time
+
+    """Adds the statistics of another search, run in parallel with this one."""
+    def merge(self, other):
+        self.iterations += other.iterations
+        self.playouts += other.playouts
+        self.nodes_allocated += other.nodes_allocated
+        self.tree_size += other.tree_size
+        self.reused_nodes += other.reused_nodes
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.total_depth += other.total_depth
+        self.selection_time += other.selection_time
+        self.expansion_time += other.expansion_time
+        self.simulation_time += other.simulation_time
+        self.backpropagation_time += other.backpropagation_time
+
+    @property
+    def average_depth(self):
+        return self.total_depth / self.iterations if self.iterations else 0.0
+
+    @property
+    def playouts_per_second(self):
+        return self.playouts / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "iterations": self.iterations,
+            "playouts": self.playouts,
+            "playouts_per_second": self.playouts_per_second,
+            "nodes_allocated": self.nodes_allocated,
+            "tree_size": self.tree_size,
+            "reused_nodes": self.reused_nodes,
+            "max_depth": self.max_depth,
+            "average_depth": self.average_depth,
+            "elapsed": self.elapsed,
+            "selection_time": self.selection_time,
+            "expansion_time": self.expansion_time,
+            "simulation_time": self.simulation_time,
+            "backpropagation_time": self.backpropagation_time,
+            "book_move": self.book_move,
+        }
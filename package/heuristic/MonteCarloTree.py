@@ -1,52 +1,328 @@
-import json
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
+from package.bitboard import BitBoard
+from package.heuristic.BatchedRollouts import BatchedRollouts
+from package.heuristic.CompactMonteCarloTree import CompactMonteCarloTree, RESULT_WINS, random_playout
+from package.heuristic.MonteCarloStatistics import MonteCarloStatistics
 from package.heuristic.MonteCarloTreeNodes import MonteCarloTreeNodes
+from package.historyIndex import HistoryIndex
 from copy import deepcopy
 import time
 
+# Number of nodes of the compact tree when there is no iteration limit
+DEFAULT_TREE_CAPACITY = 200000
+
+# Leaf parallelization: leaves selected before their playouts are sent to the workers,
+# and visits added on their path meanwhile so that the following selections go elsewhere
+LEAF_BATCH_SIZE = 64
+VIRTUAL_LOSS = 1
+# Playouts per leaf in leaf parallelization: every batch of leaves costs a round trip to the workers
+LEAF_PLAYOUTS_PER_LEAF = 64
+
 
 class MonteCarloTreeSearch:
-    def __init__(self, time_limit=1.0, iteration_limit=10000):
+    """compact_tree selects the array-backed CompactMonteCarloTree, otherwise one
+    MonteCarloTreeNodes object is created per node. With reuse_tree the compact tree is kept
+    between moves and the search continues from the node of the new position.
+
+    With workers > 1 the compact tree search runs on a process pool:
+    - parallel="root": every worker grows its own tree with the same limits, the statistics
+      of the root children are added up at the end;
+    - parallel="leaf": the tree stays in this process, batches of leaves selected with
+      virtual loss get their playouts from the workers.
+
+    With playouts_per_leaf > 1 every selected leaf is scored with that many random games
+    played together by BatchedRollouts. It defaults to 1, and to LEAF_PLAYOUTS_PER_LEAF with leaf
+    parallelization, where a single playout per leaf would not pay for the exchanges with the workers.
+
+    start_pondering(board) keeps growing the compact tree from the given position, the opponent
+    to move, in a background thread until stop_pondering() or the next get_next_move: the subtree
+    of the move actually played is then reused. It needs compact_tree, reuse_tree and one worker.
+
+    The MonteCarloStatistics of the last get_next_move call are kept in last_stats and passed
+    to stats_callback if one is given.
+
+    history_index holds the statistics of the recorded games, HistoryIndex.load() by default."""
+    def __init__(self, time_limit=1.0, iteration_limit=10000, opening_book=None, compact_tree=True,
+                 reuse_tree=True, workers=1, parallel="root", playouts_per_leaf=None, stats_callback=None,
+                 history_index=None):
+        if parallel not in ("root", "leaf"):
+            raise ValueError(f"Unknown parallelization: {parallel}")
+        leaf_parallel = parallel == "leaf" and workers > 1
+        if playouts_per_leaf is None:
+            playouts_per_leaf = LEAF_PLAYOUTS_PER_LEAF if leaf_parallel else 1
+        elif leaf_parallel and playouts_per_leaf < 2:
+            raise ValueError("Leaf parallelization needs playouts_per_leaf > 1")
         self.time_limit = time_limit
         self.iteration_limit = iteration_limit
+        self.opening_book = opening_book
+        self.compact_tree = compact_tree
+        self.reuse_tree = reuse_tree
+        self.workers = workers
+        self.parallel = parallel
+        self.rollouts = BatchedRollouts(playouts_per_leaf) if playouts_per_leaf > 1 else None
+        self.executor = None
+        self.tree = None
+        self.stats_callback = stats_callback
+        self.last_stats = MonteCarloStatistics()
         self.start_time = None
-        self.historical_data = self.load_historical_data()
-
-    def load_historical_data(self):
-        try:
-            with open("game_history.json", "r") as file:
-                historical_data = json.load(file)
-        except FileNotFoundError:
-            return {}
-        return self.analyze_historical_data(historical_data)
-
-    def analyze_historical_data(self, raw_data):
-        winning_moves = {}
-        for game in raw_data:
-            if game["winner"]:
-                for move in game["moves"]:
-                    if move[0] == game["winner"]:
-                        winning_moves[move[1]] = winning_moves.get(move[1], 0) + 1
-        return winning_moves
+        # Set by stop_search from another thread to end the search in progress
+        self.stop_requested = False
+        self.ponder_thread = None
+        self.pondering = False
+        # Statistics of the recorded games by ply and column, and their total by column for MonteCarloTreeNodes
+        self.history_index = history_index if history_index is not None else HistoryIndex.load()
+        self.historical_data = self.history_index.column_wins()
 
     def get_next_move(self, board, available_columns=None):
+        self.stop_pondering()
+        if available_columns is None:
+            available_columns = [col for col in range(7) if board[0][col] == 0]
+        self.last_stats = MonteCarloStatistics()
+        if self.opening_book is not None:
+            move = self.opening_book.get_move(board)
+            if move is not None and move in available_columns:
+                self.last_stats.book_move = True
+                self.report_stats()
+                return move
         current_player = self.determine_current_player(board)
         self.start_time = time.time()
+        if self.compact_tree:
+            if self.workers > 1 and self.parallel == "root":
+                move = self.search_root_parallel(board, current_player)
+            else:
+                move = self.search_compact_tree(board, current_player)
+        else:
+            move = self.search_tree_nodes(board, current_player)
+        self.report_stats()
+        return move
+
+    """Sends the statistics of the last search to the callback"""
+    def report_stats(self):
+        if not self.last_stats.book_move:
+            self.last_stats.elapsed = time.time() - self.start_time
+        if self.stats_callback is not None:
+            self.stats_callback(self.last_stats)
+
+    """Runs the search with one MonteCarloTreeNodes object per node"""
+    def search_tree_nodes(self, board, current_player):
+        stats = self.last_stats
         root = MonteCarloTreeNodes(deepcopy(board), player=current_player, historical_data=self.historical_data)
         iterations = 0
 
         while self.time_limit_not_reached() and self.iteration_limit_not_reached(iterations):
+            start = time.perf_counter()
             node = self.select_node(root)
+            selected = time.perf_counter()
             if not node.is_fully_expanded():
+                children = len(node.children)
                 node = node.expand()
+                stats.nodes_allocated += len(node.children) - children
+            expanded = time.perf_counter()
 
-            winner = node.simulate()
-            node.backpropagate(winner)
+            if self.rollouts is not None:
+                results = node.simulate_batch(self.rollouts)
+                simulated = time.perf_counter()
+                node.backpropagate_batch(results)
+                playouts = self.rollouts.playouts_per_leaf
+            else:
+                winner = node.simulate()
+                simulated = time.perf_counter()
+                node.backpropagate(winner)
+                playouts = 1
+            depth = 0
+            parent = node.parent
+            while parent is not None:
+                depth += 1
+                parent = parent.parent
+            stats.record_iteration(depth, playouts, selected - start, expanded - selected, simulated - expanded,
+                                   time.perf_counter() - simulated)
             iterations += 1
 
+        stats.tree_size = stats.nodes_allocated + 1
         return self.get_best_move(root)
 
+    """Runs the search on the compact tree, whose arrays are kept from one move to the next"""
+    def search_compact_tree(self, board, current_player):
+        stats = self.last_stats
+        tree, reused = self.prepare_tree(BitBoard.from_grid(board), current_player)
+        if reused:
+            stats.reused_nodes = tree.size
+        initial_size = tree.size
+
+        if self.workers > 1:
+            self.run_leaf_parallel()
+        else:
+            root_depth = len(tree.root_bitboard.history)
+            iterations = 0
+            while self.time_limit_not_reached() and self.iteration_limit_not_reached(iterations):
+                start = time.perf_counter()
+                node, bitboard, player = tree.select()
+                selected = time.perf_counter()
+                node, player = tree.expand(node, bitboard, player)
+                depth = len(bitboard.history) - root_depth
+                expanded = time.perf_counter()
+                # The playout plays its moves on the bitboard
+                wins, playouts = tree.playout(node, bitboard, player, self.rollouts)
+                simulated = time.perf_counter()
+                tree.backpropagate(node, wins, playouts)
+                stats.record_iteration(depth, playouts, selected - start,
+                                       expanded - selected, simulated - expanded, time.perf_counter() - simulated)
+                iterations += 1
+
+        stats.tree_size = tree.size
+        stats.nodes_allocated = tree.size - initial_size
+        return tree.best_move()
+
+    """Roots the compact tree at the position: the subtree of the position is kept if it is in the
+    tree of the previous search (or of the pondering), a new tree is started otherwise.
+    Returns the tree and True if the subtree was kept."""
+    def prepare_tree(self, bitboard, current_player):
+        if self.iteration_limit is None:
+            capacity = DEFAULT_TREE_CAPACITY
+        else:
+            # Room for the reused subtree on top of the nodes of this search
+            capacity = (self.iteration_limit + 1) * (2 if self.reuse_tree else 1)
+        if self.tree is None or self.tree.capacity < capacity:
+            self.tree = CompactMonteCarloTree(capacity)
+        tree = self.tree
+        reused = self.reuse_tree and tree.advance_root(bitboard, current_player)
+        if not reused:
+            tree.set_root(bitboard, current_player)
+        tree.set_priors(self.history_index)
+        return tree, reused
+
+    """Starts growing the tree of the position in a background thread (see the class docstring)."""
+    def start_pondering(self, board):
+        self.stop_pondering()
+        if not (self.compact_tree and self.reuse_tree and self.workers == 1):
+            return
+        self.pondering = True
+        self.ponder_thread = threading.Thread(
+            target=self.ponder, args=(BitBoard.from_grid(board), self.determine_current_player(board)), daemon=True)
+        self.ponder_thread.start()
+
+    def ponder(self, bitboard, current_player):
+        # Rerooting a large tree takes a while: it is done here rather than in the caller (the GUI thread)
+        tree, _ = self.prepare_tree(bitboard, current_player)
+        # Leaves room for the nodes of the next search, on top of the subtree it will reuse
+        if self.iteration_limit is None:
+            max_size = tree.capacity // 2
+        else:
+            max_size = tree.capacity - (self.iteration_limit + 1)
+        # Nothing to search after the end of the game
+        if tree.results[tree.root]:
+            return
+        while self.pondering and tree.size < max_size:
+            tree.iterate(self.rollouts)
+
+    """Stops the pondering thread, the tree it has grown is kept."""
+    def stop_pondering(self):
+        self.pondering = False
+        # The GUI and the search thread may both stop the pondering: each one joins its own copy
+        thread, self.ponder_thread = self.ponder_thread, None
+        if thread is not None:
+            thread.join()
+
+    """Root parallelization: adds up the root children statistics of the trees of the workers"""
+    def search_root_parallel(self, board, current_player):
+        executor = self.get_executor()
+        deadline = self.start_time + self.time_limit if self.time_limit is not None else None
+        futures = [executor.submit(_search_worker_tree, board, current_player, deadline)
+                   for _ in range(self.workers)]
+        wins = {}
+        visits = {}
+        for future in futures:
+            root_statistics, worker_stats = future.result()
+            self.last_stats.merge(worker_stats)
+            for move, move_wins, move_visits in root_statistics:
+                wins[move] = wins.get(move, 0) + move_wins
+                visits[move] = visits.get(move, 0) + move_visits
+
+        best_win_ratio = -float('inf')
+        best_move = None
+        for move in sorted(visits):
+            win_ratio = wins[move] / visits[move] if visits[move] > 0 else 0
+            if win_ratio > best_win_ratio:
+                best_win_ratio = win_ratio
+                best_move = move
+        return best_move
+
+    """Leaf parallelization: selects batches of leaves with virtual loss and plays them out on the workers.
+    The time spent waiting for the workers is counted as simulation time."""
+    def run_leaf_parallel(self):
+        executor = self.get_executor()
+        stats = self.last_stats
+        tree = self.tree
+        root_depth = len(tree.root_bitboard.history)
+        playouts = self.rollouts.playouts_per_leaf if self.rollouts is not None else 1
+        iterations = 0
+        while self.time_limit_not_reached() and self.iteration_limit_not_reached(iterations):
+            start = time.perf_counter()
+            batch = []
+            for _ in range(LEAF_BATCH_SIZE):
+                node, bitboard, player = tree.select()
+                node, player = tree.expand(node, bitboard, player)
+                if tree.results[node]:
+                    # Terminal node: the result is known without playout
+                    tree.backpropagate(node, *tree.playout(node, bitboard, player, self.rollouts))
+                    stats.record_iteration(len(bitboard.history) - root_depth, playouts, 0.0, 0.0, 0.0, 0.0)
+                else:
+                    tree.add_virtual_loss(node, VIRTUAL_LOSS)
+                    batch.append((node, bitboard, player))
+            iterations += LEAF_BATCH_SIZE
+            selected = time.perf_counter()
+
+            chunks = [chunk for chunk in (batch[worker::self.workers] for worker in range(self.workers)) if chunk]
+            futures = [executor.submit(_run_playouts, [(bitboard, player) for _, bitboard, player in chunk])
+                       for chunk in chunks]
+            results = [future.result() for future in futures]
+            simulated = time.perf_counter()
+
+            for chunk, chunk_wins in zip(chunks, results):
+                for (node, _, _), wins in zip(chunk, chunk_wins):
+                    tree.add_virtual_loss(node, -VIRTUAL_LOSS)
+                    tree.backpropagate(node, wins, playouts)
+            backpropagated = time.perf_counter()
+
+            # Phase times of the batch are shared between its leaves
+            share = 1 / len(batch) if batch else 0.0
+            for _, bitboard, _ in batch:
+                stats.record_iteration(len(bitboard.history) - root_depth, playouts, (selected - start) * share, 0.0,
+                                       (simulated - selected) * share, (backpropagated - simulated) * share)
+
+    def get_executor(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker,
+                initargs=(self.time_limit, self.iteration_limit, self.reuse_tree, self.history_index,
+                          self.rollouts.playouts_per_leaf if self.rollouts is not None else 1))
+        return self.executor
+
+    """Stops the pondering and shuts the process pool down"""
+    def close(self):
+        self.stop_pondering()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    """Asks the search in progress (in another thread) to stop: it returns the best move found so far.
+    The searches of root parallelization workers run until their deadline.
+    The request also stops the searches started later, until clear_stop()."""
+    def stop_search(self):
+        self.stop_requested = True
+
+    """Clears a stop request. Called before the search is handed to another thread, so that a
+    stop_search arriving while the search starts is not lost."""
+    def clear_stop(self):
+        self.stop_requested = False
+
+    # A stopped search is out of time
     def time_limit_not_reached(self):
+        if self.stop_requested:
+            return False
         if self.time_limit is None:
             return True
         return time.time() - self.start_time < self.time_limit
@@ -77,7 +353,6 @@ class MonteCarloTreeSearch:
         best_win_ratio = -float('inf')
         best_move = None
 
-        print("Child nodes win/visit ratios:")
         for child in root.children:
             win_ratio = child.wins / child.visits if child.visits > 0 else 0
             # Debugging print
@@ -92,3 +367,34 @@ class MonteCarloTreeSearch:
         player1_count = sum(row.count(1) for row in board)
         player2_count = sum(row.count(2) for row in board)
         return 1 if player1_count <= player2_count else 2
+
+
+# Search of a pool worker process
+_worker_search = None
+
+
+def _init_worker(time_limit, iteration_limit, reuse_tree, history_index, playouts_per_leaf):
+    global _worker_search
+    # Forked workers start with the same random state
+    random.seed()
+    _worker_search = MonteCarloTreeSearch(time_limit=time_limit, iteration_limit=iteration_limit, reuse_tree=reuse_tree,
+                                          playouts_per_leaf=playouts_per_leaf, history_index=history_index)
+
+
+"""Grows the tree of the worker until the deadline or the iteration limit.
+Returns the root children statistics and the statistics of the search."""
+def _search_worker_tree(board, current_player, deadline):
+    search = _worker_search
+    search.start_time = deadline - search.time_limit if deadline is not None else time.time()
+    search.last_stats = MonteCarloStatistics()
+    search.search_compact_tree(board, current_player)
+    return search.tree.root_statistics(), search.last_stats
+
+
+"""Plays out every (bitboard, player to move): playouts_per_leaf random games played together by
+BatchedRollouts, or a single one. Returns the wins of every position (draws, player 1, player 2)."""
+def _run_playouts(positions):
+    rollouts = _worker_search.rollouts
+    if rollouts is not None:
+        return rollouts.run(positions).tolist()
+    return [RESULT_WINS[random_playout(bitboard, player)] for bitboard, player in positions]
@@ -1,6 +1,8 @@
 import random
 import math
 
+from package.bitboard import BitBoard
+
 
 class MonteCarloTreeNodes:
     def __init__(self, board, move=None, parent=None, player=1, historical_data=None):
@@ -82,6 +84,11 @@ class MonteCarloTreeNodes:
             current_state = MonteCarloTreeNodes.copy_board(new_board_state)
             current_player = next_player
 
+    """Scores the node with a batch of random games played by a BatchedRollouts engine.
+    Returns the number of draws, of wins of player 1 and of wins of player 2."""
+    def simulate_batch(self, rollouts):
+        return rollouts.run([(BitBoard.from_grid(self.board), self.player)])[0].tolist()
+
     def update(self, result):
         self.visits += 1
         if self.player == result:
@@ -189,6 +196,14 @@ class MonteCarloTreeNodes:
         if self.parent:
             self.parent.backpropagate(result)
 
+    """Same as backpropagate for the results of simulate_batch"""
+    def backpropagate_batch(self, results):
+        node = self
+        while node is not None:
+            node.visits += sum(results)
+            node.wins += results[node.player]
+            node = node.parent
+
     def get_best_child(self, exploration_weight=math.sqrt(2)):
         best_score = -float('inf')
         best_child = None
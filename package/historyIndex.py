@@ -0,0 +1,87 @@
+# historyIndex.py
+import json
+import os
+
+from package.bitboard import WIDTH, HEIGHT
+from package.gameLog import GAME_LOG_DIRECTORY, HISTORY_FILE, log_end_position, read_games
+
+INDEX_FILE = "history_index.json"
+MAX_PLIES = WIDTH * HEIGHT
+
+
+class HistoryIndex:
+    """Aggregated statistics of the recorded games, keyed by ply and column.
+
+    plays[ply][col] counts the moves played in the column at that ply of a game, wins[ply][col]
+    the ones played by the player who won the game. The index has a fixed size: it is updated
+    game by game and loaded in constant time however long the history is.
+
+    The index also stores the position of the game log it is up to date with. The games written
+    after it, when the index could not be saved after the log (a crash), are added at load time."""
+
+    def __init__(self, filename=INDEX_FILE, log_directory=GAME_LOG_DIRECTORY):
+        self.filename = filename
+        self.log_directory = log_directory
+        self.log_position = (1, 0)
+        self.games = 0
+        self.plays = [[0] * WIDTH for _ in range(MAX_PLIES)]
+        self.wins = [[0] * WIDTH for _ in range(MAX_PLIES)]
+
+    """Loads the index and adds the games logged after its log position. If it does not exist yet,
+    it is built once from the recorded games."""
+    @classmethod
+    def load(cls, filename=INDEX_FILE, log_directory=GAME_LOG_DIRECTORY, legacy_file=HISTORY_FILE):
+        index = cls(filename, log_directory)
+        start = None
+        try:
+            with open(filename, "r") as file:
+                data = json.load(file)
+            index.games = data["games"]
+            index.plays = data["plays"]
+            index.wins = data["wins"]
+            start = tuple(data["log_position"])
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            print(f"Error reading the history index {filename}: {e}. Rebuilding it.")
+            index = cls(filename, log_directory)
+
+        games = index.games
+        for game in read_games(log_directory, legacy_file, start):
+            index.record_game(game["moves"], game["winner"])
+        if index.games != games:
+            index.save()
+        return index
+
+    """Adds a finished game: moves is the list of (player, column), winner None for a draw."""
+    def record_game(self, moves, winner):
+        self.games += 1
+        for ply, (player, column) in enumerate(moves):
+            self.plays[ply][column] += 1
+            if winner and player == winner:
+                self.wins[ply][column] += 1
+
+    """Saves the index, up to date with the end of the game log: the recorded games must have been
+    written to the log (GameLog.flush) before."""
+    def save(self):
+        self.log_position = log_end_position(self.log_directory)
+        # Written next to the index then renamed, so that an interrupted save never leaves a broken index
+        temporary_file = self.filename + ".tmp"
+        with open(temporary_file, "w") as file:
+            json.dump({"games": self.games, "plays": self.plays, "wins": self.wins,
+                       "log_position": list(self.log_position)}, file)
+        os.replace(temporary_file, self.filename)
+
+    """Returns the share of the moves played in the column at that ply that were played by the winner."""
+    def win_rate(self, ply, column):
+        plays = self.plays[ply][column]
+        return self.wins[ply][column] / plays if plays else 0.0
+
+    """Returns the number of winning moves per column, all plies together: {column: count}."""
+    def column_wins(self):
+        column_wins = {}
+        for ply_wins in self.wins:
+            for column, count in enumerate(ply_wins):
+                if count:
+                    column_wins[column] = column_wins.get(column, 0) + count
+        return column_wins
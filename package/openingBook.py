@@ -0,0 +1,187 @@
+# openingBook.py
+#
+# Binary opening book: a header followed by records sorted by position key.
+#   header: magic (4 bytes), version (uint16), plies (uint16), record count (uint32)
+#   record: key (uint64, BitBoard.key()), move (int8), score (int8, UNKNOWN_SCORE if not solved)
+# Only one position of every mirrored pair is stored (the one with the lowest key).
+import argparse
+import mmap
+import os
+import struct
+
+from package.bitboard import BitBoard, WIDTH, mirror_key
+
+MAGIC = b"C4OB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")
+RECORD = struct.Struct("<Qbb")
+UNKNOWN_SCORE = -128
+
+DEFAULT_BOOK_FILE = "package/opening_book.bin"
+
+
+class OpeningBook:
+    """Read-only opening book mapped in memory. Lookups are binary searches in the mapped file,
+    so opening the book costs no parsing and no memory proportional to its size."""
+
+    def __init__(self, filename):
+        self.file = open(filename, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < HEADER.size:
+            self.file.close()
+            raise ValueError(f"{filename} is not an opening book")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.plies, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION or size != HEADER.size + self.count * RECORD.size:
+            self.close()
+            raise ValueError(f"{filename} is not an opening book")
+
+    """Opens the book if the file exists, returns None otherwise."""
+    @classmethod
+    def open_if_exists(cls, filename=DEFAULT_BOOK_FILE):
+        try:
+            return cls(filename)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+    def __len__(self):
+        return self.count
+
+    """Returns the (move, score) stored for the exact key, or None."""
+    def _find(self, key):
+        low, high = 0, self.count
+        data = self.data
+        while low < high:
+            middle = (low + high) // 2
+            record_key, move, score = RECORD.unpack_from(data, HEADER.size + middle * RECORD.size)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                return move, score
+        return None
+
+    """Returns (move, score) for the position key, or None if the position is not in the book."""
+    def lookup(self, key):
+        entry = self._find(key)
+        if entry is not None:
+            return entry
+        entry = self._find(mirror_key(key))
+        if entry is not None:
+            return WIDTH - 1 - entry[0], entry[1]
+        return None
+
+    """Returns the score of the position key, or None if it is unknown. Used by ConnectFourSolver."""
+    def get(self, key):
+        entry = self.lookup(key)
+        if entry is None or entry[1] == UNKNOWN_SCORE:
+            return None
+        return entry[1]
+
+    """Returns the book move for the board (6x7 list of lists), or None."""
+    def get_move(self, board):
+        bitboard = BitBoard.from_grid(board)
+        if bitboard.move_count() >= self.plies:
+            return None
+        entry = self.lookup(bitboard.key())
+        return entry[0] if entry is not None else None
+
+
+"""Writes a book file from a {key: (move, score)} dictionary."""
+def write_opening_book(filename, entries, plies):
+    with open(filename, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, plies, len(entries)))
+        for key in sorted(entries):
+            move, score = entries[key]
+            file.write(RECORD.pack(key, move, score))
+
+
+"""Returns the positions with fewer than plies pieces reachable from the empty board,
+as {key: bitboard}, keeping one position of every mirrored pair."""
+def enumerate_positions(plies):
+    positions = {}
+    frontier = [BitBoard()]
+    for ply in range(plies):
+        next_frontier = []
+        player = 1 if ply % 2 == 0 else 2
+        for bitboard in frontier:
+            key = bitboard.key()
+            canonical = min(key, mirror_key(key))
+            if canonical in positions:
+                continue
+            positions[canonical] = bitboard
+            for col in bitboard.legal_moves():
+                child = bitboard.copy()
+                bit = child.play(col, player)
+                if not child.is_winning_bit(player, bit):
+                    next_frontier.append(child)
+        frontier = next_frontier
+    return positions
+
+
+"""Computes the book move of every position with fewer than plies pieces.
+With exact, ConnectFourSolver gives the moves and the scores of the positions with at least exact_from
+pieces: earlier positions cannot be solved in a reasonable time, so they are searched as without exact.
+Otherwise MiniMaxAlgorithm searches to the given depth and scores are unknown."""
+def generate_opening_book(plies, depth=7, exact=False, exact_from=None):
+    # Imported here: the agents import this module to read the book
+    from package.optimization.minMax import MiniMaxAlgorithm
+    from package.optimization.solver import ConnectFourSolver, SOLVER_MIN_PLY
+
+    if exact_from is None:
+        exact_from = SOLVER_MIN_PLY
+
+    solver = ConnectFourSolver() if exact else None
+    minimax = MiniMaxAlgorithm(max_depth=depth)
+    entries = {}
+    for key, bitboard in enumerate_positions(plies).items():
+        grid = bitboard.to_grid()
+        available_columns = bitboard.legal_moves()
+        # The stored key is the canonical one, which may be the mirror of this position
+        mirrored = key != bitboard.key()
+        if solver is not None and bitboard.move_count() >= exact_from:
+            scores = solver.analyze(grid)
+            move = solver.get_next_move(grid, available_columns)
+            score = scores[move]
+        else:
+            if bitboard.move_count() % 2 == 1:
+                # MiniMaxAlgorithm plays the pieces of player 1: swap the colours when player 2 is to move
+                grid = [[(3 - piece) if piece else 0 for piece in row] for row in grid]
+            move = minimax.get_next_move(grid, available_columns)
+            score = UNKNOWN_SCORE
+        entries[key] = (WIDTH - 1 - move if mirrored else move, score)
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates the opening book used by the agents.")
+    parser.add_argument("--plies", type=int, default=4, help="the book covers positions with fewer pieces")
+    parser.add_argument("--depth", type=int, default=7, help="MiniMax search depth of every book move")
+    parser.add_argument("--exact", action="store_true",
+                        help="solve the positions instead of searching them, from --exact-from pieces only")
+    parser.add_argument("--exact-from", type=int, default=None,
+                        help="fewest pieces of a solved position (default: the solver's, earlier is very slow)")
+    parser.add_argument("--output", default=DEFAULT_BOOK_FILE)
+    args = parser.parse_args()
+
+    # Imported here, as in generate_opening_book
+    from package.optimization.solver import SOLVER_MIN_PLY
+
+    exact_from = args.exact_from if args.exact_from is not None else SOLVER_MIN_PLY
+    if args.exact and args.plies <= exact_from:
+        print("Warning: --exact only solves the positions with at least --exact-from pieces, "
+              "none of the book positions is solved")
+    entries = generate_opening_book(args.plies, depth=args.depth, exact=args.exact, exact_from=exact_from)
+    write_opening_book(args.output, entries, args.plies)
+    print(f"{len(entries)} positions written in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
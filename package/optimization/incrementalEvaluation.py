@@ -0,0 +1,69 @@
+# incrementalEvaluation.py
+from package.bitboard import WINDOWS, WINDOWS_THROUGH, COLUMN_BITS
+
+CENTER_COLUMN = 3
+
+# Every window is stored as a single code: (pieces of player 1) + 5 * (pieces of player 2).
+# WINDOW_WEIGHTS[code] is the weight of the window in the former list-board evaluation of minimax,
+# in units of (10 - depth): 5 for three pieces of player 1 and an empty cell, 2 for two pieces
+# of player 1 and two empty cells, -5 for three pieces of player 2 and an empty cell.
+CODE_STEP = [0, 1, 5]
+WINDOW_WEIGHTS = [0] * 25
+WINDOW_WEIGHTS[3] = 5
+WINDOW_WEIGHTS[2] = 2
+WINDOW_WEIGHTS[3 * 5] = -5
+
+
+class IncrementalEvaluator:
+    """Keeps the minimax evaluation of the position up to date as moves are played and taken back.
+    It equals the former list-board evaluation, kept in tests/test_incremental_evaluation.py to check it.
+
+    Each move only touches the windows going through its cell, and score() is O(1).
+    The score is the one of a position without four in a row; wins are detected by the search."""
+
+    def __init__(self):
+        self.codes = [0] * len(WINDOWS)
+        self.total = 0
+        self.center_count = 0
+
+    """Builds the evaluator of a BitBoard position."""
+    @classmethod
+    def from_bitboard(cls, bitboard):
+        evaluator = cls()
+        for player in (1, 2):
+            pieces = bitboard.pieces[player]
+            while pieces:
+                low = pieces & -pieces
+                evaluator.play(low.bit_length() - 1, player)
+                pieces ^= low
+        return evaluator
+
+    """Adds a piece of the player on the bit index."""
+    def play(self, bit, player):
+        codes = self.codes
+        step = CODE_STEP[player]
+        total = self.total
+        for window in WINDOWS_THROUGH[bit]:
+            code = codes[window]
+            codes[window] = code + step
+            total += WINDOW_WEIGHTS[code + step] - WINDOW_WEIGHTS[code]
+        self.total = total
+        if player == 1 and bit // COLUMN_BITS == CENTER_COLUMN:
+            self.center_count += 1
+
+    """Removes the piece of the player from the bit index."""
+    def undo(self, bit, player):
+        codes = self.codes
+        step = CODE_STEP[player]
+        total = self.total
+        for window in WINDOWS_THROUGH[bit]:
+            code = codes[window]
+            codes[window] = code - step
+            total += WINDOW_WEIGHTS[code - step] - WINDOW_WEIGHTS[code]
+        self.total = total
+        if player == 1 and bit // COLUMN_BITS == CENTER_COLUMN:
+            self.center_count -= 1
+
+    """Returns the score of the position found at the given depth of the search."""
+    def score(self, depth):
+        return 3 * self.center_count + (10 - depth) * self.total
@@ -1,181 +1,367 @@
 # minMax.py
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_EXCEPTION, wait
+
+from package.bitboard import BitBoard, grid_key
+from package.optimization.incrementalEvaluation import IncrementalEvaluator
+from package.optimization.transpositionTable import (TranspositionTable, DEFAULT_SIZE, EXACT, LOWER_BOUND,
+                                                     UPPER_BOUND)
 
 MAX_DEPTH = 5
 
 
+# Columns sorted from the center to the edges: central moves take part in more lines
+CENTER_ORDER = [3, 2, 4, 1, 5, 0, 6]
+CENTER_RANK = [CENTER_ORDER.index(col) for col in range(7)]
+
+# The budget is only checked every BUDGET_CHECK_INTERVAL + 1 nodes
+BUDGET_CHECK_INTERVAL = 1023
+
+
+class SearchAborted(Exception):
+    """Raised inside the search when the time or node budget of the move is spent."""
+
+
 class MiniMaxAlgorithm:
+    """With a time_limit (seconds) or a node_limit, the search deepens one ply at a time up to
+    max_depth and returns the best move of the last completed iteration once the budget runs out.
+    Without budget it searches directly to max_depth.
+
+    With workers > 1 the root moves are split across a process pool (the node_limit then applies
+    to every root move). The chosen move is the same as the one of the serial search. stop_search
+    also stops the pool workers, through an event they check with the budget.
+
+    start_pondering(board) searches, in a background thread, the positions after the replies of the
+    opponent to move in the board, center first, until stop_pondering() or the next get_next_move.
+    The moves found are kept by position key and played at once if the position comes up."""
+    def __init__(self, max_depth=MAX_DEPTH, table_size=DEFAULT_SIZE, time_limit=None, node_limit=None, workers=1,
+                 opening_book=None):
+        self.max_depth = max_depth
+        self.opening_book = opening_book
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.table_size = table_size
+        self.workers = workers
+        self.executor = None
+        self.shared_alpha = None
+        # Shared with the pool workers (or given to a worker's search): set to stop their searches
+        self.stop_event = None
+        self.root_board = None
+        self.transposition_table = TranspositionTable(table_size)
+        self.search_depth = max_depth
+        self.completed_depth = 0
+        self.nodes = 0
+        self.deadline = None
+        # Set by stop_search from another thread to abort the search in progress
+        self.stop_requested = False
+        self.killer_moves = []
+        self.history_scores = []
+        self.bitboard = None
+        self.evaluator = None
+        self.root_move_count = 0
+        # Pondering: separate search object run by the thread, moves found by position key
+        self.ponder_search = None
+        self.ponder_thread = None
+        self.pondering = False
+        self.ponder_moves = {}
+
     """Returns the value of the column where MinMax should play"""
     def get_next_move(self, board, available_columns):
+        self.stop_pondering()
+        move = self.ponder_moves.get(grid_key(board))
+        if move is not None and move in available_columns:
+            # Ponder hit
+            return move
+        if self.opening_book is not None:
+            move = self.opening_book.get_move(board)
+            if move is not None and move in available_columns:
+                return move
+        self.set_position(board)
+        self.start_search()
+        root_moves = sorted(available_columns, key=CENTER_RANK.__getitem__)
+        search_root = self.search_root_parallel if self.workers > 1 else self.search_root
+        if self.time_limit is None and self.node_limit is None:
+            best_move, _ = search_root(root_moves, self.max_depth)
+            self.completed_depth = self.max_depth
+            return best_move
+
+        best_move = root_moves[0] if root_moves else None
+        for depth in range(1, self.max_depth + 1):
+            try:
+                best_move, _ = search_root(root_moves, depth)
+            except SearchAborted:
+                # Take back the moves of the interrupted branch
+                while self.bitboard.move_count() > self.root_move_count:
+                    self.undo_move()
+                break
+            self.completed_depth = depth
+            # The best move of this iteration is searched first in the next one
+            root_moves = [best_move] + [move for move in root_moves if move != best_move]
+        return best_move
+
+    """Starts searching the replies to the position in a background thread (see the class docstring)."""
+    def start_pondering(self, board):
+        self.stop_pondering()
+        self.ponder_moves = {}
+        if self.ponder_search is None:
+            self.ponder_search = MiniMaxAlgorithm(self.max_depth, self.table_size, self.time_limit, self.node_limit,
+                                                  opening_book=self.opening_book)
+        self.ponder_search.clear_stop()
+        self.pondering = True
+        self.ponder_thread = threading.Thread(target=self.ponder, args=([row[:] for row in board],), daemon=True)
+        self.ponder_thread.start()
+
+    def ponder(self, board):
+        bitboard = BitBoard.from_grid(board)
+        opponent = 1 if bitboard.move_count() % 2 == 0 else 2
+        for reply in CENTER_ORDER:
+            if not self.pondering:
+                return
+            if not bitboard.can_play(reply) or bitboard.is_winning_move(reply, opponent):
+                continue
+            bitboard.play(reply, opponent)
+            available_columns = bitboard.legal_moves()
+            if available_columns:
+                try:
+                    move = self.ponder_search.get_next_move(bitboard.to_grid(), available_columns)
+                except SearchAborted:
+                    return
+                # A search cut short by stop_pondering is not kept
+                if not self.pondering:
+                    return
+                self.ponder_moves[bitboard.key()] = move
+            bitboard.undo()
+
+    """Stops the pondering thread, the moves found so far are kept."""
+    def stop_pondering(self):
+        self.pondering = False
+        # The GUI and the search thread may both stop the pondering: each one joins its own copy
+        thread, self.ponder_thread = self.ponder_thread, None
+        if thread is not None:
+            self.ponder_search.stop_search()
+            thread.join()
+
+    """Builds the search position once: the search then plays and takes back moves on it"""
+    def set_position(self, board):
+        self.root_board = [row[:] for row in board]
+        self.bitboard = BitBoard.from_grid(board)
+        self.evaluator = IncrementalEvaluator.from_bitboard(self.bitboard)
+        self.root_move_count = self.bitboard.move_count()
+
+    """Resets the per-move search state: budget, counters, ordering heuristics."""
+    def start_search(self):
+        # Scores depend on the depth they were found at, so entries of a previous root cannot be reused
+        self.transposition_table.clear()
+        self.nodes = 0
+        self.completed_depth = 0
+        self.deadline = time.time() + self.time_limit if self.time_limit is not None else None
+        self.killer_moves = [[None, None] for _ in range(self.max_depth + 1)]
+        self.history_scores = [[0] * 7 for _ in range(3)]
+
+    """Searches every root move to the given depth and returns (best move, best score).
+    Moves with the same score are split in favour of the leftmost column."""
+    def search_root(self, root_moves, depth):
+        self.search_depth = depth
         best_score = float('-inf')
         best_move = None
-        alpha = float('-inf')
-        beta = float('inf')
-
-        for move in available_columns:
-            temp_board = self.make_move(board, move, 1)
-            score = self.minimax(temp_board, 0, alpha, beta, False, available_columns)
-            if score > best_score:
+        for move in root_moves:
+            won = self.play_move(move, 1)
+            # Scores are integers: a window starting just below the best score still tells ties apart
+            alpha = best_score - 1
+            score = self.minimax(0, alpha, float('inf'), False, won)
+            self.undo_move()
+            if score > best_score or (score == best_score and move < best_move):
                 best_score = score
                 best_move = move
+        return best_move, best_score
+
+    """Same as search_root with the root moves spread over the process pool. The first move is searched
+    alone to get a bound, then its younger brothers are searched in parallel with the best score found so far."""
+    def search_root_parallel(self, root_moves, depth):
+        if self.executor is None:
+            self.shared_alpha = multiprocessing.Value('d', float('-inf'))
+            self.stop_event = multiprocessing.Event()
+            if self.stop_requested:
+                self.stop_event.set()
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                initargs=(self.shared_alpha, self.stop_event, self.max_depth,
+                                                          self.table_size))
+        self.shared_alpha.value = float('-inf')
+        search_args = (self.root_board, depth, self.deadline, self.node_limit)
+
+        results = []
+        if root_moves:
+            results.append(self.executor.submit(_search_root_move, root_moves[0], *search_args).result())
+        futures = [self.executor.submit(_search_root_move, move, *search_args) for move in root_moves[1:]]
+        done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in not_done:
+            future.cancel()
+        results.extend(future.result() for future in futures if future in done)
 
-        return best_move
-    """MinMax algorithm: explores the branches of the decision tree to deduce the best score"""
-    def minimax(self, board, depth, alpha, beta, is_maximizing, available_columns):
-        if self.is_terminal_node(board) or depth == MAX_DEPTH:
-            return self.evaluate_board(board, depth)
+        best_score = float('-inf')
+        best_move = None
+        for move, score, nodes in results:
+            self.nodes += nodes
+            if score > best_score or (score == best_score and move < best_move):
+                best_score = score
+                best_move = move
+        return best_move, best_score
+
+    """Stops the pondering and shuts the process pool down, stopping the searches of the workers"""
+    def close(self):
+        self.stop_pondering()
+        if self.executor is not None:
+            self.stop_event.set()
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+            self.stop_event = None
+
+    """MinMax algorithm: explores the branches of the decision tree to deduce the best score.
+    won tells if the move that led to the node completed four in a row."""
+    def minimax(self, depth, alpha, beta, is_maximizing, won):
+        self.nodes += 1
+        if self.nodes & BUDGET_CHECK_INTERVAL == 0:
+            self.check_budget()
+        if won:
+            # The player who just moved is the minimizing one when it is the maximizing one's turn
+            return -100000 if is_maximizing else 100000
+        if depth == self.search_depth or self.bitboard.is_full():
+            return self.evaluator.score(depth)
+
+        key = self.bitboard.key()
+        remaining_depth = self.search_depth - depth
+        entry = self.transposition_table.lookup(key)
+        if entry is not None and entry[1] >= remaining_depth:
+            score, _, flag = entry
+            if flag == EXACT:
+                return score
+            if flag == LOWER_BOUND:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if beta <= alpha:
+                return score
+        alpha_start, beta_start = alpha, beta
 
         if is_maximizing:
             max_eval = float('-inf')
-            for move in available_columns:
-                temp_board = self.make_move(board, move, 1)
-                eval = self.minimax(temp_board, depth + 1, alpha, beta, False, available_columns)
+            for move in self.order_moves(self.bitboard.legal_moves(), depth, 1):
+                won = self.play_move(move, 1)
+                eval = self.minimax(depth + 1, alpha, beta, False, won)
+                self.undo_move()
                 max_eval = max(max_eval, eval)
                 alpha = max(alpha, eval)
                 if beta <= alpha:
+                    self.record_cutoff(move, depth, 1, remaining_depth)
                     break
-            return max_eval
+            best_eval = max_eval
         else:
             min_eval = float('inf')
-            for move in available_columns:
-                temp_board = self.make_move(board, move, 2)
-                eval = self.minimax(temp_board, depth + 1, alpha, beta, True, available_columns)
+            for move in self.order_moves(self.bitboard.legal_moves(), depth, 2):
+                won = self.play_move(move, 2)
+                eval = self.minimax(depth + 1, alpha, beta, True, won)
+                self.undo_move()
                 min_eval = min(min_eval, eval)
                 beta = min(beta, eval)
                 if beta <= alpha:
+                    self.record_cutoff(move, depth, 2, remaining_depth)
                     break
-            return min_eval
-
-    """Checks if a move is possible or not (full column)"""
-    @staticmethod
-    def get_possible_moves(board):
-        return [c for c in range(7) if board[0][c] == 0]
-
-    @staticmethod
-    def make_move(board, column, player):
-        temp_board = [row[:] for row in board]
-        for row in reversed(range(6)):
-            if temp_board[row][column] == 0:
-                temp_board[row][column] = player
-                break
-        return temp_board
-
-    """Checks if you have reached the end of the decision tree"""
-    @staticmethod
-    def is_terminal_node(board):
-        # Utilise une logique similaire à check_winner de ConnectFourGame
-        # Vérifie également si le plateau est plein
-        for row in range(6):
-            for col in range(4):
-                if board[row][col] != 0 and all(board[row][col] == board[row][col + i] for i in range(4)):
-                    return True
-
-        for col in range(7):
-            for row in range(3):
-                if board[row][col] != 0 and all(board[row + i][col] == board[row][col] for i in range(4)):
-                    return True
-
-        for col in range(4):
-            for row in range(3, 6):
-                if board[row][col] != 0 and all(board[row - i][col + i] == board[row][col] for i in range(4)):
-                    return True
-
-        for col in range(4):
-            for row in range(3):
-                if board[row][col] != 0 and all(board[row + i][col + i] == board[row][col] for i in range(4)):
-                    return True
-
-        if all(board[0][col] != 0 for col in range(7)):  # Vérifie si le plateau est plein
-            return True
-
-        return False
-
-    """Evaluate the board to return the score"""
-    def evaluate_board(self, board, depth):
-        if self.winning_move(board, 1):
-            return 100000
-
-        if self.winning_move(board, 2):
-            return -100000
-        score = 0
-        score_center = 3
-        score_3_align = 5 * (10 - depth)
-        score_2_align = 2 * (10 - depth)
-
-
-
-        center_array = [board[i][3] for i in range(6)]
-        center_count = center_array.count(1)
-        score += center_count * score_center
-
-        for row in range(6):
-            row_array = board[row]
-            for col in range(4):
-                window = row_array[col:col + 4]
-                score += self.evaluate_window(window, score_3_align, score_2_align)
-
-        for col in range(7):
-            col_array = [board[row][col] for row in range(6)]
-            for row in range(3):
-                window = col_array[row:row + 4]
-                score += self.evaluate_window(window, score_3_align, score_2_align)
-
-        for row in range(3, 6):
-            for col in range(4):
-                window = [board[row - i][col + i] for i in range(4)]
-                score += self.evaluate_window(window, score_3_align, score_2_align)
-
-        for row in range(3):
-            for col in range(4):
-                window = [board[row + i][col + i] for i in range(4)]
-                score += self.evaluate_window(window, score_3_align, score_2_align)
-
-        return score
-
-    """Check if a player will win"""
-    @staticmethod
-    def winning_move(board, piece):
-        # Constants for the board size
-        ROW_COUNT = 6
-        COLUMN_COUNT = 7
-
-        # Check horizontal locations for win
-        for c in range(COLUMN_COUNT - 3):
-            for r in range(ROW_COUNT):
-                if board[r][c] == piece and board[r][c + 1] == piece and board[r][c + 2] == piece and board[r][c + 3] == piece:
-                    return True
-
-        # Check vertical locations for win
-        for c in range(COLUMN_COUNT):
-            for r in range(ROW_COUNT - 3):
-                if board[r][c] == piece and board[r + 1][c] == piece and board[r + 2][c] == piece and board[r + 3][c] == piece:
-                    return True
-
-        # Check positively sloped diagonals
-        for c in range(COLUMN_COUNT - 3):
-            for r in range(ROW_COUNT - 3):
-                if board[r][c] == piece and board[r + 1][c + 1] == piece and board[r + 2][c + 2] == piece and \
-                        board[r + 3][c + 3] == piece:
-                    return True
-
-        # Check negatively sloped diagonals
-        for c in range(COLUMN_COUNT - 3):
-            for r in range(3, ROW_COUNT):
-                if board[r][c] == piece and board[r - 1][c + 1] == piece and board[r - 2][c + 2] == piece and \
-                        board[r - 3][c + 3] == piece:
-                    return True
-
-        return False
-
-    """Evaluates the window to know if a line is blocked by the edges or not"""
-    @staticmethod
-    def evaluate_window(window, score_3_align, score_2_align):
-        score = 0
-        if window.count(1) == 3 and window.count(0) == 1:
-            score += score_3_align
-        elif window.count(1) == 2 and window.count(0) == 2:
-            score += score_2_align
-
-        if window.count(2) == 3 and window.count(0) == 1:
-            score -= score_3_align
-
-        return score
+            best_eval = min_eval
+
+        if best_eval <= alpha_start:
+            flag = UPPER_BOUND
+        elif best_eval >= beta_start:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.transposition_table.store(key, best_eval, remaining_depth, flag)
+        return best_eval
+
+    """Plays a move on the search board and returns True if it wins"""
+    def play_move(self, column, player):
+        bit = self.bitboard.play(column, player)
+        self.evaluator.play(bit, player)
+        return self.bitboard.is_winning_bit(player, bit)
+
+    """Takes back the last move played on the search board"""
+    def undo_move(self):
+        column, player = self.bitboard.undo()
+        self.evaluator.undo(self.bitboard.heights[column], player)
+
+    """Asks the search in progress (in another thread) to stop: it raises SearchAborted at the next
+    budget check, or returns the best move of the last completed iteration with a budget.
+    The request also stops the searches started later, until clear_stop()"""
+    def stop_search(self):
+        self.stop_requested = True
+        if self.stop_event is not None:
+            self.stop_event.set()
+
+    """Clears a stop request. Called before the search is handed to another thread, so that a
+    stop_search arriving while the search starts is not lost"""
+    def clear_stop(self):
+        self.stop_requested = False
+        if self.stop_event is not None:
+            self.stop_event.clear()
+
+    """Raises SearchAborted when the time or node budget is spent, or when the search has been stopped"""
+    def check_budget(self):
+        if self.stop_requested or (self.stop_event is not None and self.stop_event.is_set()):
+            raise SearchAborted()
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise SearchAborted()
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchAborted()
+
+    """Orders the moves: killer moves of the depth first, then history score, then center first"""
+    def order_moves(self, moves, depth, player):
+        killers = self.killer_moves[depth]
+        history = self.history_scores[player]
+        return sorted(moves, key=lambda move: (move != killers[0], move != killers[1], -history[move],
+                                               CENTER_RANK[move]))
+
+    """Remembers a move that caused a beta cutoff, for the ordering of the sibling nodes"""
+    def record_cutoff(self, move, depth, player, remaining_depth):
+        killers = self.killer_moves[depth]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history_scores[player][move] += remaining_depth * remaining_depth
+
+
+# Search state of a pool worker process
+_worker_algorithm = None
+_worker_alpha = None
+_worker_root_key = None
+
+
+def _init_worker(shared_alpha, stop_event, max_depth, table_size):
+    global _worker_algorithm, _worker_alpha
+    _worker_algorithm = MiniMaxAlgorithm(max_depth=max_depth, table_size=table_size)
+    _worker_algorithm.stop_event = stop_event
+    _worker_alpha = shared_alpha
+
+
+"""Searches one root move in a pool worker and returns (move, score, nodes searched)."""
+def _search_root_move(move, board, depth, deadline, node_limit):
+    global _worker_root_key
+    algorithm = _worker_algorithm
+    algorithm.set_position(board)
+    # The transposition table and the ordering heuristics stay valid as long as the root does not change
+    if algorithm.bitboard.key() != _worker_root_key:
+        algorithm.start_search()
+        _worker_root_key = algorithm.bitboard.key()
+    algorithm.deadline = deadline
+    algorithm.node_limit = node_limit
+    algorithm.nodes = 0
+    algorithm.search_depth = depth
+
+    # Scores are integers: a window starting just below the best score still tells ties apart
+    alpha = _worker_alpha.value - 1
+    won = algorithm.play_move(move, 1)
+    score = algorithm.minimax(0, alpha, float('inf'), False, won)
+    with _worker_alpha.get_lock():
+        if score > _worker_alpha.value:
+            _worker_alpha.value = score
+    return move, score, algorithm.nodes
@@ -0,0 +1,225 @@
+# solver.py
+from package.bitboard import BitBoard, WIDTH, HEIGHT, COLUMN_BITS, BOTTOM_MASK, BOARD_MASK, COLUMN_MASKS
+from package.optimization.minMax import CENTER_ORDER, MiniMaxAlgorithm
+from package.optimization.transpositionTable import TranspositionTable, DEFAULT_SIZE, LOWER_BOUND, UPPER_BOUND
+
+BOARD_SIZE = WIDTH * HEIGHT
+TOP_MASKS = [1 << (col * COLUMN_BITS + HEIGHT - 1) for col in range(WIDTH)]
+ORDERED_COLUMN_MASKS = [COLUMN_MASKS[col] for col in CENTER_ORDER]
+# Fewest pieces from which a position is solved in a few seconds at most: earlier, the solver is far too slow
+SOLVER_MIN_PLY = 18
+
+
+"""Returns the empty cells where one more piece would give four in a row to the owner of position."""
+def winning_cells(position, mask):
+    # Vertical
+    cells = (position << 1) & (position << 2) & (position << 3)
+
+    # Horizontal and both diagonals
+    for shift in (COLUMN_BITS, COLUMN_BITS - 1, COLUMN_BITS + 1):
+        pair = (position << shift) & (position << 2 * shift)
+        cells |= pair & (position << 3 * shift)
+        cells |= pair & (position >> shift)
+        pair = (position >> shift) & (position >> 2 * shift)
+        cells |= pair & (position << shift)
+        cells |= pair & (position >> 3 * shift)
+
+    return cells & (BOARD_MASK ^ mask)
+
+
+"""Returns the cells where the next piece can be dropped."""
+def playable_cells(mask):
+    return (mask + BOTTOM_MASK) & BOARD_MASK
+
+
+"""Returns the number of set bits of an integer."""
+def popcount(value):
+    return bin(value).count("1")
+
+
+class ConnectFourSolver:
+    """Strong solver: returns the exact value of a position with perfect play from both sides.
+
+    A score is positive if the player to move wins, negative if they lose and 0 for a draw.
+    Its absolute value is the number of empty cells the winner still has when playing their
+    last piece, plus one: the faster the win, the higher the score.
+
+    The search is a negamax with alpha-beta pruning probed with null windows around a
+    moving guess (as MTD(f) does), a transposition table and an optional opening book
+    holding scores of early positions."""
+
+    def __init__(self, table_size=DEFAULT_SIZE, opening_book=None):
+        self.transposition_table = TranspositionTable(table_size)
+        self.opening_book = opening_book
+        self.nodes = 0
+
+    """Returns the column with the best score for the player to move"""
+    def get_next_move(self, board, available_columns):
+        scores = self.analyze(board)
+        best_move = None
+        for col in CENTER_ORDER:
+            if col in available_columns and scores[col] is not None:
+                if best_move is None or scores[col] > scores[best_move]:
+                    best_move = col
+        return best_move
+
+    """Returns the score of every column for the player to move (None for a full column)"""
+    def analyze(self, board):
+        bitboard = BitBoard.from_grid(board)
+        current, mask, moves = self.split_position(bitboard)
+        scores = [None] * WIDTH
+        for col in range(WIDTH):
+            if mask & TOP_MASKS[col]:
+                continue
+            move = playable_cells(mask) & COLUMN_MASKS[col]
+            if winning_cells(current, mask) & move:
+                scores[col] = (BOARD_SIZE + 1 - moves) // 2
+            else:
+                scores[col] = -self.solve_position(current ^ mask, mask | move, moves + 1)
+        return scores
+
+    """Returns the exact score of the board for the player to move.
+    With weak, only tells who wins: 1 if the player to move wins, -1 if they lose, 0 for a draw,
+    which is found much faster"""
+    def solve(self, board, weak=False):
+        current, mask, moves = self.split_position(BitBoard.from_grid(board))
+        score = self.solve_position(current, mask, moves, weak)
+        return (score > 0) - (score < 0) if weak else score
+
+    """Returns (pieces of the player to move, mask of all the pieces, number of pieces).
+    Player 1 always plays first."""
+    @staticmethod
+    def split_position(bitboard):
+        mask = bitboard.mask()
+        moves = popcount(mask)
+        current = bitboard.pieces[1] if moves % 2 == 0 else bitboard.pieces[2]
+        return current, mask, moves
+
+    """Returns the score of the position for the player to move. With weak, the score is only
+    searched between -1 and 1: its sign is right, not its value"""
+    def solve_position(self, current, mask, moves, weak=False):
+        if winning_cells(current, mask) & playable_cells(mask):
+            return (BOARD_SIZE + 1 - moves) // 2
+        if weak:
+            low, high = -1, 1
+        else:
+            low, high = -((BOARD_SIZE - moves) // 2), (BOARD_SIZE + 1 - moves) // 2
+
+        # Null window searches tell if the score is above or below a guess, which narrows [low, high]
+        while low < high:
+            guess = low + (high - low) // 2
+            if guess <= 0 and int(low / 2) < guess:
+                guess = int(low / 2)
+            elif guess >= 0 and high // 2 > guess:
+                guess = high // 2
+            score = self.negamax(current, mask, moves, guess, guess + 1)
+            if score <= guess:
+                high = score
+            else:
+                low = score
+        return low
+
+    """Negamax with alpha-beta pruning. Only called on positions where the player to move cannot win at once."""
+    def negamax(self, current, mask, moves, alpha, beta):
+        self.nodes += 1
+
+        opponent_wins = winning_cells(current ^ mask, mask)
+        playable = playable_cells(mask)
+        forced = playable & opponent_wins
+        if forced:
+            if forced & (forced - 1):
+                # Two threats of the opponent: the game is lost
+                return -((BOARD_SIZE - moves) // 2)
+            playable = forced
+        # Never play just below a cell where the opponent would win
+        candidates = playable & ~(opponent_wins >> 1)
+        if not candidates:
+            return -((BOARD_SIZE - moves) // 2)
+
+        if moves >= BOARD_SIZE - 2:
+            return 0
+
+        lowest = -((BOARD_SIZE - 2 - moves) // 2)
+        if alpha < lowest:
+            alpha = lowest
+            if alpha >= beta:
+                return alpha
+        highest = (BOARD_SIZE - 1 - moves) // 2
+        if beta > highest:
+            beta = highest
+            if alpha >= beta:
+                return beta
+
+        key = current + mask
+        entry = self.transposition_table.lookup(key)
+        if entry is not None:
+            score, _, flag = entry
+            if flag == LOWER_BOUND:
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        return alpha
+            elif score < beta:
+                beta = score
+                if alpha >= beta:
+                    return beta
+
+        if self.opening_book is not None:
+            score = self.opening_book.get(self.book_key(current, mask, moves))
+            if score is not None:
+                return score
+
+        # Moves creating the most threats first, center columns first on equal threats
+        ordered = []
+        for column_mask in ORDERED_COLUMN_MASKS:
+            move = candidates & column_mask
+            if move:
+                ordered.append((-popcount(winning_cells(current | move, mask)), len(ordered), move))
+        ordered.sort()
+
+        opponent = current ^ mask
+        for _, _, move in ordered:
+            score = -self.negamax(opponent, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                self.transposition_table.store(key, score, 0, LOWER_BOUND)
+                return score
+            if score > alpha:
+                alpha = score
+
+        self.transposition_table.store(key, alpha, 0, UPPER_BOUND)
+        return alpha
+
+    """Returns the BitBoard key of the position, used by the opening book"""
+    @staticmethod
+    def book_key(current, mask, moves):
+        player1 = current if moves % 2 == 0 else current ^ mask
+        return player1 + mask + BOTTOM_MASK
+
+
+class SolverAgent:
+    """Agent playing the moves of ConnectFourSolver once the board holds at least min_ply pieces,
+    and the moves of the fallback agent (a MiniMaxAlgorithm by default) in the opening."""
+
+    def __init__(self, min_ply=SOLVER_MIN_PLY, fallback=None, opening_book=None):
+        self.solver = ConnectFourSolver()
+        self.min_ply = min_ply
+        self.fallback = fallback if fallback is not None else MiniMaxAlgorithm(opening_book=opening_book)
+
+    def get_next_move(self, board, available_columns):
+        pieces = sum(1 for row in board for piece in row if piece != 0)
+        if pieces < self.min_ply:
+            return self.fallback.get_next_move(board, available_columns)
+        return self.solver.get_next_move(board, available_columns)
+
+    """Stops the search of the fallback agent (a solve cannot be stopped, but it is short)."""
+    def stop_search(self):
+        if hasattr(self.fallback, "stop_search"):
+            self.fallback.stop_search()
+
+    def clear_stop(self):
+        if hasattr(self.fallback, "clear_stop"):
+            self.fallback.clear_stop()
+
+    def close(self):
+        if hasattr(self.fallback, "close"):
+            self.fallback.close()
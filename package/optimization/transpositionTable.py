@@ -0,0 +1,67 @@
+# transpositionTable.py
+from array import array
+
+# Bound types of a stored score
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+DEFAULT_SIZE = 131071  # number of buckets (prime), two entries per bucket
+
+
+class TranspositionTable:
+    """Fixed-size table of search results keyed by a compact position hash.
+
+    Every bucket holds two entries: the first one keeps the deepest search seen for
+    the bucket (depth-preferred), the second one is always replaced. All entries live
+    in preallocated typed arrays, so the memory used never grows during a search."""
+
+    def __init__(self, size=DEFAULT_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+
+    """Empties the table and resets the statistics."""
+    def clear(self):
+        slots = 2 * self.size
+        self.keys = array('q', [0]) * slots
+        self.scores = array('q', [0]) * slots
+        self.depths = array('b', [-1]) * slots  # -1 marks an empty entry
+        self.flags = array('b', [EXACT]) * slots
+        self.hits = 0
+        self.misses = 0
+
+    """Returns (score, depth, flag) stored for the key, or None if the key is not in the table."""
+    def lookup(self, key):
+        slot = 2 * (key % self.size)
+        keys = self.keys
+        if keys[slot] != key or self.depths[slot] < 0:
+            slot += 1
+            if keys[slot] != key or self.depths[slot] < 0:
+                self.misses += 1
+                return None
+        self.hits += 1
+        return self.scores[slot], self.depths[slot], self.flags[slot]
+
+    """Stores a search result. depth is the remaining search depth below the position."""
+    def store(self, key, score, depth, flag):
+        slot = 2 * (key % self.size)
+        if self.keys[slot] == key or depth >= self.depths[slot]:
+            # The depth-preferred entry moves down to the always-replace entry
+            if self.keys[slot] != key and self.depths[slot] >= 0:
+                self._write(slot + 1, self.keys[slot], self.scores[slot], self.depths[slot], self.flags[slot])
+            self._write(slot, key, score, depth, flag)
+        else:
+            self._write(slot + 1, key, score, depth, flag)
+
+    def _write(self, slot, key, score, depth, flag):
+        self.keys[slot] = key
+        self.scores[slot] = score
+        self.depths[slot] = depth
+        self.flags[slot] = flag
+
+    """Returns the share of lookups that found an entry."""
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
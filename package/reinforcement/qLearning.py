@@ -2,89 +2,183 @@ import json
 
 import numpy as np
 
+from package.bitboard import WIDTH, grid_key, mirror_key
+from package.reinforcement.qTable import QTable, is_q_table_file
+
+
+"""Returns the reward of a move for the player. Only used for reinforcement learning."""
+def calculate_reward(winner, done, player):
+    if winner == player:
+        # Reward to win
+        return 1
+    elif done:
+        # Neutral reward for a draw
+        return 0
+    else:
+        # Small penalty to continue play
+        return -0.1
+
+
 class QLearningAlgorithm:
-    def __init__(self, alpha=0.1, gamma=0.9, epsilon=0.1):
+    def __init__(self, alpha=0.1, gamma=0.9, epsilon=0.1, opening_book=None, checkpoint_file=None,
+                 checkpoint_every=1000, replay_buffer=None, replay_batch_size=32):
         self.alpha = alpha
         self.gamma = gamma
         self.epsilon = epsilon
-        self.q_table = {}  # initialise with an empty table or load a pre-existing table
+        self.opening_book = opening_book
+        self.q_table = QTable()  # initialise with an empty table or load a pre-existing table
+        # If checkpoint_file is set, the changed Q values are written to it every checkpoint_every updates
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_every = checkpoint_every
+        self.updates = 0
+        # If replay_buffer is set, the transitions are stored in it and every update also replays
+        # replay_batch_size transitions sampled from it
+        self.replay_buffer = replay_buffer
+        self.replay_batch_size = replay_batch_size
 
     """Returns the next move to play."""
     def get_next_move(self, board_state, available_columns):
-        state = self._board_to_state(board_state)
+        if self.opening_book is not None:
+            move = self.opening_book.get_move(board_state)
+            if move is not None and move in available_columns:
+                return move
+        state, mirrored = self._canonical_state(self._board_to_state(board_state))
         if np.random.uniform(0, 1) < self.epsilon:
             # Random selection from available columns
             return np.random.choice(available_columns)
         else:
             # Select the best action from the available columns
-            return self._best_action(state, available_columns)
+            return self._best_action(state, available_columns, mirrored)
 
-    """Updates the Q table based on the result of the last action."""
+    """Updates the Q table based on the result of the last action.
+    States are boards or state keys (ConnectFourGame.get_state_key)."""
     def update_q_table(self, current_state, action, reward, next_state, done):
-        # Converts the state into a string for use as a key in table Q
-        current_state_key = str(current_state)
-        next_state_key = str(next_state)
-
-        # Initializes Q values if the state is not yet in the table
-        if current_state_key not in self.q_table:
-            self.q_table[current_state_key] = np.zeros(7)
-        if next_state_key not in self.q_table:
-            self.q_table[next_state_key] = np.zeros(7)
+        current_state, mirrored = self._canonical_state(self._board_to_state(current_state))
+        if mirrored:
+            action = WIDTH - 1 - action
+        # The maximum Q value of a state is the same in its mirror
+        next_state = self._canonical_state(self._board_to_state(next_state))[0]
+        current_row = self.q_table.row(current_state)
+        next_row = self.q_table.row(next_state)
 
         # Update table Q
-        old_value = self.q_table[current_state_key][action]
-        next_max = np.max(self.q_table[next_state_key])
+        values = self.q_table.values
+        old_value = values[current_row, action]
+        next_max = values[next_row].max()
 
         new_value = (1 - self.alpha) * old_value + self.alpha * (reward + self.gamma * next_max * (1 - int(done)))
-        self.q_table[current_state_key][action] = new_value
-
-    """Returns the best action to take from the given state."""
-    def _best_action(self, state, available_columns):
-        state_key = str(state)
-        if state_key in self.q_table:
-            # Create a filter for available actions
-            action_filter = [i for i in range(7) if i in available_columns]
-
-            # Apply the filter to obtain the available actions and Q values
-            filtered_actions = np.array(action_filter)
-            filtered_q_values = np.array([self.q_table[state_key][i] for i in filtered_actions])
-
-            # Select the action with the maximum Q value
-            return filtered_actions[np.argmax(filtered_q_values)]
+        values[current_row, action] = new_value
+        self.q_table.changed.add(current_row)
+
+        if self.replay_buffer is not None:
+            self.replay_buffer.add(current_state, action, reward, next_state, done)
+            self.replay(self.replay_batch_size)
+
+        self.updates += 1
+        if self.checkpoint_file is not None and self.updates % self.checkpoint_every == 0:
+            self.checkpoint_q_table(self.checkpoint_file)
+
+    """Applies Q updates in bulk: arrays of rows of the current states, actions, rewards, rows of
+    the next states and done flags. The updates of the same Q value compound as if they were applied
+    one after the other in order, their targets being computed from the Q values before the batch."""
+    def update_q_values(self, current_rows, actions, rewards, next_rows, dones):
+        values = self.q_table.values
+        targets = rewards + self.gamma * values[next_rows].max(axis=1) * (1 - dones)
+
+        # After k updates of a Q value: (1 - alpha)^k Q + sum(alpha (1 - alpha)^(k - i) target_i)
+        cells = current_rows * WIDTH + actions
+        order = np.argsort(cells, kind="stable")
+        unique_cells, starts, counts = np.unique(cells[order], return_index=True, return_counts=True)
+        groups = np.repeat(np.arange(len(unique_cells)), counts)
+        later_updates = np.repeat(starts + counts, counts) - np.arange(len(cells)) - 1
+        decay = 1 - self.alpha
+        contributions = np.zeros(len(unique_cells))
+        np.add.at(contributions, groups, self.alpha * decay ** later_updates * targets[order])
+        flat_values = values.reshape(-1)
+        flat_values[unique_cells] = decay ** counts * flat_values[unique_cells] + contributions
+        self.q_table.changed.update(current_rows.tolist())
+
+    """Replays batch_size transitions sampled from the replay buffer."""
+    def replay(self, batch_size):
+        if self.replay_buffer is None or not len(self.replay_buffer):
+            return
+        states, actions, rewards, next_states, dones = self.replay_buffer.sample(batch_size)
+        current_rows = self.q_table.rows(states.tolist())
+        next_rows = self.q_table.rows(next_states.tolist())
+        self.update_q_values(current_rows, actions, rewards, next_rows, dones)
+
+    """Returns the best action to take from the given canonical state.
+    If mirrored is set, the position played is the mirror of the state."""
+    def _best_action(self, state, available_columns, mirrored=False):
+        q_values = self.q_table.get(state)
+        if q_values is not None:
+            # Select the available action with the maximum Q value, the first one in case of a tie
+            filtered_actions = sorted(available_columns)
+            state_actions = [WIDTH - 1 - action for action in filtered_actions] if mirrored else filtered_actions
+            return filtered_actions[int(np.argmax(q_values[state_actions]))]
         else:
             return np.random.choice(available_columns)
 
-    """Converts the board into a string."""
+    """Converts the board into its state key, an integer (keys are returned as they are)."""
     def _board_to_state(self, board):
-        # Converts the board into a string
-        return str(board)
-
-    """Saves the Q table in a JSON file."""
+        if isinstance(board, int):
+            return board
+        return grid_key(board)
+
+    """Returns the canonical state of a position and its mirror, the one with the lowest key,
+    and True if it is the mirror. Both positions share the Q values, with the actions mirrored."""
+    def _canonical_state(self, state):
+        mirrored_state = mirror_key(state)
+        if mirrored_state < state:
+            return mirrored_state, True
+        return state, False
+
+    """Saves the whole Q table in a binary file (see qTable.py)."""
     def save_q_table(self, filename):
         print(f"Saving the Q table in {filename}")
         try:
-            # Converts each numpy array into a list
-            serializable_q_table = {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in self.q_table.items()}
-
-            with open(filename, "w") as file:
-                json.dump(serializable_q_table, file)
+            self.q_table.save(filename)
         except Exception as e:
             print(f"Error saving file {filename}: {e}")
 
+    """Writes the Q values changed since the last save or checkpoint to the journal of the file,
+    so that a crash loses at most the updates made since the last checkpoint."""
+    def checkpoint_q_table(self, filename):
+        try:
+            self.q_table.checkpoint(filename)
+        except Exception as e:
+            print(f"Error writing a checkpoint of {filename}: {e}")
 
-    """Loads the Q table from a JSON file."""
+    """Loads the Q table from a binary file and its journal, or from a JSON file of an older version."""
     def load_q_table(self, filename):
         print(f"Attempt to load the file: {filename}")
+        self.q_table = QTable()
         try:
-            with open(filename, "r") as file:
-                self.q_table = json.load(file)
+            if is_q_table_file(filename):
+                self.q_table = QTable.load(filename)
+            else:
+                self._load_json_q_table(filename)
         except FileNotFoundError:
             print(f"The file {filename} does not exist. Initialisation of a new Q table.")
-            self.q_table = {}
-        except json.JSONDecodeError:
-            print(f"Error reading JSON file {filename}. Initialising a new table Q.")
-            self.q_table = {}
+        except (json.JSONDecodeError, UnicodeDecodeError, ValueError):
+            print(f"Error reading the Q table file {filename}. Initialising a new table Q.")
+            self.q_table = QTable()
         except Exception as e:
             print(f"An unexpected error has occurred while reading the file {filename}: {e}")
-            self.q_table = {}
-
+            self.q_table = QTable()
+
+    def _load_json_q_table(self, filename):
+        with open(filename, "r") as file:
+            data = json.load(file)
+        self.q_table = QTable(len(data))
+        for state, values in data.items():
+            # Tables saved before the state keys were keyed by str(board)
+            key = grid_key(json.loads(state)) if state.startswith("[") else int(state)
+            key, mirrored = self._canonical_state(key)
+            values = np.array(values, dtype=float)
+            if mirrored:
+                values = values[::-1]
+            if key in self.q_table:
+                # Older tables may hold both a position and its mirror
+                values = (self.q_table.get(key) + values) / 2
+            self.q_table.set(key, values)
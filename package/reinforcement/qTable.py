@@ -0,0 +1,343 @@
+# qTable.py
+#
+# Binary Q table file: a header, the sorted state keys, then the Q values in the same order.
+#   header: magic (4 bytes), version (uint16), width (uint16), generation (uint64), state count (uint64)
+#   keys: uint64[count], values: float64[count, width]
+# Checkpoints between two full saves are appended to a journal next to it (filename + ".journal"):
+#   header: magic (4 bytes), version (uint16), width (uint16), generation (uint64)
+#   records: key (uint64), values (float64[width])
+# The journal is only replayed on the file of the same generation, later records win.
+import os
+import struct
+
+import numpy as np
+
+from package.bitboard import WIDTH
+
+INITIAL_CAPACITY = 1024
+
+MAGIC = b"C4QT"
+JOURNAL_MAGIC = b"C4QJ"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQQ")
+JOURNAL_HEADER = struct.Struct("<4sHHQ")
+JOURNAL_RECORD = np.dtype([("key", "<u8"), ("values", "<f8", (WIDTH,))])
+
+
+def journal_file(filename):
+    return filename + ".journal"
+
+
+"""Returns True if the file starts like a binary Q table."""
+def is_q_table_file(filename):
+    with open(filename, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+class QTable:
+    """Q values of all the states: the sorted keys and Q values of the last file loaded or saved,
+    mapped in memory, under an overlay of the states read or changed since then.
+
+    States are integer keys (see bitboard.grid_key). A state of the file is found by binary search
+    and copied to the overlay the first time its row is asked for, so loading a table neither reads
+    the whole file nor builds a dict of all its states. The overlay is one growable (states, 7) float
+    array, index maps a key to its row; it doubles its capacity when it is full, so adding a state is
+    amortised O(1). The rows changed since the last save or checkpoint are kept in changed."""
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.index = {}
+        self.row_keys = []
+        self.values = np.zeros((max(capacity, 1), WIDTH))
+        self.size = 0
+        self.changed = set()
+        # Sorted keys and Q values of the file, and the number of them copied to the overlay
+        self.base_keys = np.empty(0, dtype=np.uint64)
+        self.base_values = np.empty((0, WIDTH))
+        self.base_copied = 0
+        # File the table was last saved to or loaded from, and the generation of that file
+        self.filename = None
+        self.generation = 0
+
+    def __len__(self):
+        return self.size + len(self.base_keys) - self.base_copied
+
+    def __contains__(self, key):
+        return key in self.index or self._base_row(key) >= 0
+
+    def keys(self):
+        return (key for key, _ in self.items())
+
+    """Yields (key, Q values) pairs, the Q values are views on the table."""
+    def items(self):
+        index = self.index
+        for key, row in index.items():
+            yield key, self.values[row]
+        for start in range(0, len(self.base_keys), 65536):
+            for offset, key in enumerate(self.base_keys[start:start + 65536].tolist()):
+                if key not in index:
+                    yield key, self.base_values[start + offset]
+
+    # Position of the state in the file arrays, -1 if it is not there
+    def _base_row(self, key):
+        base_keys = self.base_keys
+        if not len(base_keys):
+            return -1
+        position = int(np.searchsorted(base_keys, np.uint64(key)))
+        if position < len(base_keys) and base_keys[position] == key:
+            return position
+        return -1
+
+    """Returns the Q values of the state, or None if the state is unknown."""
+    def get(self, key):
+        row = self.index.get(key)
+        if row is not None:
+            return self.values[row]
+        position = self._base_row(key)
+        return self.base_values[position] if position >= 0 else None
+
+    """Returns the overlay row of the state, adding the state if it is not there: with its Q values
+    of the file, or with zero Q values if it is unknown."""
+    def row(self, key):
+        row = self.index.get(key)
+        if row is None:
+            if self.size == len(self.values):
+                self._grow(2 * self.size)
+            row = self.size
+            self.index[key] = row
+            self.row_keys.append(key)
+            self.size += 1
+            position = self._base_row(key)
+            if position >= 0:
+                self.values[row] = self.base_values[position]
+                self.base_copied += 1
+            else:
+                self.changed.add(row)
+        return row
+
+    """Returns the Q values of a sequence of states as a (states, 7) array, and a bool array
+    telling which states are known (the Q values of the others are zero). The table is not changed."""
+    def lookup(self, keys):
+        index = self.index
+        rows = np.fromiter((index.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+        found = rows >= 0
+        q_values = np.zeros((len(keys), WIDTH))
+        q_values[found] = self.values[rows[found]]
+        if len(self.base_keys) and not found.all():
+            missing = np.flatnonzero(~found)
+            missing_keys = np.array(keys, dtype=np.uint64)[missing]
+            positions = np.minimum(np.searchsorted(self.base_keys, missing_keys), len(self.base_keys) - 1)
+            in_base = self.base_keys[positions] == missing_keys
+            found[missing[in_base]] = True
+            q_values[missing[in_base]] = self.base_values[positions[in_base]]
+        return q_values, found
+
+    """Returns the rows of a sequence of states as an int array, adding the states that are not there."""
+    def rows(self, keys):
+        row = self.row
+        return np.fromiter((row(key) for key in keys), dtype=np.int64, count=len(keys))
+
+    """Sets the Q values of the state."""
+    def set(self, key, values):
+        row = self.row(key)
+        self.values[row] = values
+        self.changed.add(row)
+
+    def _grow(self, capacity):
+        values = np.zeros((capacity, WIDTH))
+        values[:self.size] = self.values[:self.size]
+        self.values = values
+
+    # Sorted keys and Q values of all the states
+    def _arrays(self):
+        keys = np.array(self.row_keys, dtype=np.uint64)
+        values = self.values[:self.size]
+        if len(self.base_keys):
+            kept = ~np.isin(self.base_keys, keys) if self.base_copied else slice(None)
+            keys = np.concatenate([self.base_keys[kept], keys])
+            values = np.concatenate([self.base_values[kept], values])
+        order = np.argsort(keys)
+        return keys[order], values[order]
+
+    # Makes the sorted arrays the file arrays of the table, with an empty overlay
+    def _set_base(self, keys, values):
+        self.index = {}
+        self.row_keys = []
+        self.values = np.zeros((INITIAL_CAPACITY, WIDTH))
+        self.size = 0
+        self.base_keys = keys
+        self.base_values = values
+        self.base_copied = 0
+
+    # Maps the keys and Q values of a table file
+    def _map_file(self, filename, count):
+        if not count:
+            self._set_base(np.empty(0, dtype=np.uint64), np.empty((0, WIDTH)))
+            return
+        keys = np.memmap(filename, dtype="<u8", mode="r", offset=HEADER.size, shape=(count,))
+        values = np.memmap(filename, dtype="<f8", mode="r", offset=HEADER.size + 8 * count, shape=(count, WIDTH))
+        self._set_base(keys, values)
+
+    # All the states are pickled in memory, for the arena workers
+    def __getstate__(self):
+        keys, values = self._arrays()
+        return {"keys": keys, "values": values}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self._set_base(state["keys"], state["values"])
+
+    """Returns the keys and Q values of the states changed since the last save or checkpoint."""
+    def changed_rows(self):
+        rows = sorted(self.changed)
+        return np.array([self.row_keys[row] for row in rows], dtype=np.uint64), self.values[rows]
+
+    """Returns a table with the changes of the workers added to base: base + sum(worker - base).
+    changes are the changed_rows() of copies of base updated separately (by the arena workers), so
+    that an update made by one worker is kept as is instead of being averaged with the unchanged
+    copies, and only the rows that changed are sent back and merged."""
+    @classmethod
+    def merge(cls, changes, base):
+        keys, values = base._arrays()
+        changes = [(changed_keys, changed_values) for changed_keys, changed_values in changes if len(changed_keys)]
+        if changes:
+            changed_keys = np.concatenate([changed_keys for changed_keys, _ in changes])
+            deltas = np.concatenate([changed_values for _, changed_values in changes])
+            positions, in_base = cls._positions(keys, changed_keys)
+            deltas[in_base] -= values[positions[in_base]]
+
+            # Deltas of the same state added up, then added to base or appended as new states
+            unique_keys, inverse = np.unique(changed_keys, return_inverse=True)
+            sums = np.zeros((len(unique_keys), WIDTH))
+            np.add.at(sums, inverse.ravel(), deltas)
+            positions, in_base = cls._positions(keys, unique_keys)
+            values[positions[in_base]] += sums[in_base]
+            keys = np.concatenate([keys, unique_keys[~in_base]])
+            values = np.concatenate([values, sums[~in_base]])
+            order = np.argsort(keys)
+            keys, values = keys[order], values[order]
+
+        merged = cls()
+        merged._set_base(keys, values)
+        return merged
+
+    # Positions of the keys in the sorted keys array, and whether they are there
+    @staticmethod
+    def _positions(sorted_keys, keys):
+        if not len(sorted_keys):
+            return np.zeros(len(keys), dtype=np.int64), np.zeros(len(keys), dtype=bool)
+        positions = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+        return positions, sorted_keys[positions] == keys
+
+    """Writes the whole table and starts a new, empty journal."""
+    def save(self, filename):
+        if filename != self.filename:
+            self.filename = filename
+            self.generation = self._file_generation(filename)
+        self.generation += 1
+        keys, values = self._arrays()
+        # The mapping of the file is released before the file is replaced
+        self._set_base(keys, values)
+
+        # Written next to the files then renamed, so that a crash never leaves a broken table
+        temporary_file = filename + ".tmp"
+        with open(temporary_file, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, WIDTH, self.generation, len(keys)))
+            file.write(keys.astype("<u8").tobytes())
+            file.write(values.astype("<f8").tobytes())
+        os.replace(temporary_file, filename)
+
+        with open(temporary_file, "wb") as file:
+            file.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, VERSION, WIDTH, self.generation))
+        os.replace(temporary_file, journal_file(filename))
+        self._map_file(filename, len(keys))
+        self.changed = set()
+
+    """Appends the rows changed since the last save or checkpoint to the journal.
+    Falls back to a full save if the table has not been saved in this file yet, or if the
+    journal has grown larger than the table."""
+    def checkpoint(self, filename):
+        journal = journal_file(filename)
+        # A journal of another generation (left by a crash during a save) would never be replayed
+        if filename != self.filename or self._journal_generation(journal) != self.generation or \
+                os.path.getsize(journal) > len(self) * JOURNAL_RECORD.itemsize:
+            self.save(filename)
+            return
+        if not self.changed:
+            return
+
+        keys, values = self.changed_rows()
+        records = np.empty(len(keys), dtype=JOURNAL_RECORD)
+        records["key"] = keys
+        records["values"] = values
+        with open(journal, "r+b") as file:
+            # Written after the last whole record: a record cut by a crash is overwritten
+            records_size = os.fstat(file.fileno()).st_size - JOURNAL_HEADER.size
+            file.seek(JOURNAL_HEADER.size + records_size - records_size % JOURNAL_RECORD.itemsize)
+            file.truncate()
+            file.write(records.tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+        self.changed = set()
+
+    """Loads a binary table, mapping the file in memory, then replays its journal."""
+    @classmethod
+    def load(cls, filename):
+        with open(filename, "rb") as file:
+            header = file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"{filename} is not a Q table")
+        magic, version, width, generation, count = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION or width != WIDTH or \
+                os.path.getsize(filename) != HEADER.size + count * 8 * (1 + WIDTH):
+            raise ValueError(f"{filename} is not a Q table")
+
+        table = cls()
+        table.filename = filename
+        table.generation = generation
+        table._map_file(filename, count)
+        table._replay_journal(journal_file(filename))
+        table.changed = set()
+        return table
+
+    # Generation of an existing table file, 0 if there is none
+    @staticmethod
+    def _file_generation(filename):
+        try:
+            with open(filename, "rb") as file:
+                header = file.read(HEADER.size)
+        except FileNotFoundError:
+            return 0
+        if len(header) < HEADER.size or header[:len(MAGIC)] != MAGIC:
+            return 0
+        return HEADER.unpack(header)[3]
+
+    # Generation in the header of a journal, None if there is no valid journal
+    @staticmethod
+    def _journal_generation(journal):
+        try:
+            with open(journal, "rb") as file:
+                header = file.read(JOURNAL_HEADER.size)
+        except FileNotFoundError:
+            return None
+        if len(header) < JOURNAL_HEADER.size:
+            return None
+        magic, version, width, generation = JOURNAL_HEADER.unpack(header)
+        if (magic, version, width) != (JOURNAL_MAGIC, VERSION, WIDTH):
+            return None
+        return generation
+
+    def _replay_journal(self, journal):
+        try:
+            with open(journal, "rb") as file:
+                header = file.read(JOURNAL_HEADER.size)
+                data = file.read()
+        except FileNotFoundError:
+            return
+        if len(header) < JOURNAL_HEADER.size or \
+                JOURNAL_HEADER.unpack(header) != (JOURNAL_MAGIC, VERSION, WIDTH, self.generation):
+            return
+        # A record cut by a crash is ignored
+        count = len(data) // JOURNAL_RECORD.itemsize
+        records = np.frombuffer(data, dtype=JOURNAL_RECORD, count=count)
+        for key, values in zip(records["key"].tolist(), records["values"]):
+            self.set(key, values)
@@ -0,0 +1,56 @@
+import numpy as np
+
+
+class ReplayBuffer:
+    """Last capacity transitions (state, action, reward, next state, done) in preallocated arrays.
+
+    States are canonical state keys (see QLearningAlgorithm._canonical_state), actions are
+    mirrored accordingly. When the buffer is full, new transitions overwrite the oldest ones."""
+
+    def __init__(self, capacity=100000, seed=None):
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.uint64)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.next_states = np.zeros(capacity, dtype=np.uint64)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.position = 0
+        self.size = 0
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state, done):
+        position = self.position
+        self.states[position] = state
+        self.actions[position] = action
+        self.rewards[position] = reward
+        self.next_states[position] = next_state
+        self.dones[position] = done
+        self.position = (position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    """Adds arrays of transitions."""
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        count = len(states)
+        if count > self.capacity:
+            # Only the last transitions fit
+            states, actions, rewards, next_states, dones = (
+                array[-self.capacity:] for array in (states, actions, rewards, next_states, dones))
+            count = self.capacity
+        positions = (self.position + np.arange(count)) % self.capacity
+        self.states[positions] = states
+        self.actions[positions] = actions
+        self.rewards[positions] = rewards
+        self.next_states[positions] = next_states
+        self.dones[positions] = dones
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    """Returns batch_size random transitions (with replacement) as arrays:
+    states, actions, rewards, next states, dones."""
+    def sample(self, batch_size):
+        indexes = self.rng.integers(0, self.size, size=batch_size)
+        return (self.states[indexes], self.actions[indexes], self.rewards[indexes], self.next_states[indexes],
+                self.dones[indexes])
@@ -0,0 +1,247 @@
+# trainer.py
+#
+# Trains a Q-learning agent without the GUI, many games at once:
+#   python -m package.reinforcement.trainer --games 100000 --opponent self
+import argparse
+import time
+
+import numpy as np
+
+from package.agents import q_table_file
+from package.bitboard import BOTTOM_MASK, COLUMN_BITS, WIDTH, HEIGHT
+from package.heuristic.BatchedRollouts import BIT_VALUES, COLUMN_TOPS, LINE_MASKS
+from package.optimization.minMax import MiniMaxAlgorithm
+from package.reinforcement.qLearning import QLearningAlgorithm, calculate_reward
+from package.reinforcement.replayBuffer import ReplayBuffer
+
+OPPONENTS = ["self", "random", "minmax"]
+
+_BOTTOM = np.uint64(BOTTOM_MASK)
+_COLUMN = np.uint64((1 << COLUMN_BITS) - 1)
+_SHIFTS = [np.uint64(col * COLUMN_BITS) for col in range(WIDTH)]
+_COLUMN_BASES = np.array([col * COLUMN_BITS for col in range(WIDTH)], dtype=np.int64)
+_MIRRORED_COLUMNS = np.arange(WIDTH)[::-1]
+
+
+"""Returns the state keys (bitboard.grid_key) of arrays of player 1 pieces and occupied cells."""
+def state_keys(pieces1, mask):
+    return pieces1 + mask + _BOTTOM
+
+
+"""Returns the keys of the mirrored positions of an array of keys (bitboard.mirror_key)."""
+def mirror_keys(keys):
+    mirrored = np.zeros_like(keys)
+    for col in range(WIDTH):
+        mirrored |= ((keys >> _SHIFTS[col]) & _COLUMN) << _SHIFTS[WIDTH - 1 - col]
+    return mirrored
+
+
+class SelfPlayTrainer:
+    """Plays num_envs games at once as NumPy arrays and trains a QLearningAlgorithm on them.
+
+    Every game is two bitboards, the column heights and the player to move. At each step, the
+    learner picks epsilon-greedy moves for all the games where it is to move, the opponent plays
+    in the others, and the Q updates of the step are applied in bulk. The updates are the ones the
+    GUI applies (see agents.update_learning_agent): after a winning move the mover's agent learns,
+    after any other move the agent of the next player. Within a step the updates of the same Q value
+    (the early positions are the same in many games) compound as if they were applied one by one.
+
+    opponent is "self" (the learner plays both sides), "random", "minmax", or an agent with a
+    get_next_move(board, available_columns) method, which is given the board as if it was player 1."""
+
+    def __init__(self, agent=None, opponent="self", num_envs=256, learner_player=None, minmax_depth=2, seed=None):
+        self.agent = agent if agent is not None else QLearningAlgorithm()
+        if opponent == "minmax":
+            opponent = MiniMaxAlgorithm(max_depth=minmax_depth)
+        self.opponent = opponent
+        self.num_envs = num_envs
+        self.rng = np.random.default_rng(seed)
+
+        # Side of the learner in every game: the given player, or alternately 1 and 2
+        sides = np.arange(num_envs) % 2 + 1 if learner_player is None else np.full(num_envs, learner_player)
+        self.learner_side = sides.astype(np.int8)
+
+        self.pieces = np.zeros((3, num_envs), dtype=np.uint64)
+        self.heights = np.empty((num_envs, WIDTH), dtype=np.int64)
+        self.player = np.empty(num_envs, dtype=np.int8)
+        self.reset(np.arange(num_envs))
+
+    def reset(self, envs):
+        self.pieces[:, envs] = 0
+        self.heights[envs] = _COLUMN_BASES
+        self.player[envs] = 1
+
+    def _learner_plays(self, envs):
+        if self.opponent == "self":
+            return np.ones(len(envs), dtype=bool)
+        return self.player[envs] == self.learner_side[envs]
+
+    """Returns a random legal column for every game."""
+    def random_moves(self, legal):
+        keys = self.rng.random(legal.shape)
+        keys[~legal] = -1.0
+        return keys.argmax(axis=1)
+
+    """Epsilon-greedy moves of the learner: the available column with the highest Q value, the
+    first one in case of a tie, and random moves for the unknown states and with probability epsilon."""
+    def learner_moves(self, keys, legal):
+        agent = self.agent
+        mirrored = mirror_keys(keys)
+        is_mirrored = mirrored < keys
+        canonical = np.where(is_mirrored, mirrored, keys)
+
+        moves = self.random_moves(legal)
+        q_values, known = agent.q_table.lookup(canonical.tolist())
+        greedy = known & (self.rng.random(len(keys)) >= agent.epsilon)
+        if greedy.any():
+            q_values = q_values[greedy]
+            q_values[is_mirrored[greedy]] = q_values[is_mirrored[greedy]][:, _MIRRORED_COLUMNS]
+            q_values[~legal[greedy]] = -np.inf
+            moves[greedy] = q_values.argmax(axis=1)
+        return moves
+
+    def opponent_moves(self, envs, legal):
+        if self.opponent == "random":
+            return self.random_moves(legal)
+        moves = np.empty(len(envs), dtype=np.int64)
+        for index, env in enumerate(envs.tolist()):
+            # The opponent sees its own pieces as the pieces of player 1
+            player = self.player[env]
+            own, other = int(self.pieces[player, env]), int(self.pieces[3 - player, env])
+            board = [[0] * WIDTH for _ in range(HEIGHT)]
+            for col in range(WIDTH):
+                for height in range(HEIGHT):
+                    bit = 1 << (col * COLUMN_BITS + height)
+                    if own & bit:
+                        board[HEIGHT - 1 - height][col] = 1
+                    elif other & bit:
+                        board[HEIGHT - 1 - height][col] = 2
+            available_columns = np.flatnonzero(legal[index]).tolist()
+            move = self.opponent.get_next_move(board, available_columns)
+            moves[index] = move if move in available_columns else self.rng.choice(available_columns)
+        return moves
+
+    """Plays one move in every game. Returns the games that are over and their winners (0 for a draw)."""
+    def step(self):
+        envs = np.arange(self.num_envs)
+        player = self.player
+        pieces1, pieces2 = self.pieces[1], self.pieces[2]
+        keys = state_keys(pieces1, pieces1 | pieces2)
+        legal = self.heights < COLUMN_TOPS
+
+        columns = np.empty(self.num_envs, dtype=np.int64)
+        learner = self._learner_plays(envs)
+        if learner.any():
+            columns[learner] = self.learner_moves(keys[learner], legal[learner])
+        if not learner.all():
+            columns[~learner] = self.opponent_moves(envs[~learner], legal[~learner])
+
+        bits = self.heights[envs, columns]
+        self.heights[envs, columns] = bits + 1
+        mover = player.copy()
+        pieces = self.pieces[mover, envs] | BIT_VALUES[bits]
+        self.pieces[mover, envs] = pieces
+        masks = LINE_MASKS[bits]
+        won = ((pieces[:, None] & masks) == masks).any(axis=1)
+        full = ~(self.heights < COLUMN_TOPS).any(axis=1)
+        done = won | full
+        # The winner keeps the move, as in ConnectFourGame
+        player[~won] = 3 - player[~won]
+
+        winners = np.where(won, mover, 0)
+        self.update(envs, keys, columns, winners, done)
+        return envs[done], winners[done]
+
+    """Applies the Q updates of one step in bulk."""
+    def update(self, envs, keys, columns, winners, done):
+        agent = self.agent
+        # Agent that learns from the move: the mover after a win, the next player otherwise
+        learning_player = self.player[envs]
+        if self.opponent != "self":
+            learning = learning_player == self.learner_side[envs]
+            envs, keys, columns, winners, done, learning_player = (
+                envs[learning], keys[learning], columns[learning], winners[learning], done[learning],
+                learning_player[learning])
+        if not len(envs):
+            return
+
+        rewards = np.full(len(envs), calculate_reward(None, False, 1))
+        rewards[done] = calculate_reward(None, True, 1)
+        rewards[(winners != 0) & (winners == learning_player)] = calculate_reward(1, True, 1)
+
+        mirrored = mirror_keys(keys)
+        is_mirrored = mirrored < keys
+        actions = np.where(is_mirrored, WIDTH - 1 - columns, columns)
+        states = np.minimum(keys, mirrored)
+        current_rows = agent.q_table.rows(states.tolist())
+
+        pieces1, pieces2 = self.pieces[1, envs], self.pieces[2, envs]
+        next_keys = state_keys(pieces1, pieces1 | pieces2)
+        next_states = np.minimum(next_keys, mirror_keys(next_keys))
+        next_rows = agent.q_table.rows(next_states.tolist())
+
+        agent.update_q_values(current_rows, actions, rewards, next_rows, done)
+        agent.updates += len(envs)
+
+        # Every new transition is followed by replay_batch_size replayed ones
+        if agent.replay_buffer is not None:
+            agent.replay_buffer.add_batch(states, actions, rewards, next_states, done)
+            agent.replay(agent.replay_batch_size * len(envs))
+
+    """Plays num_games games. Returns the result counts, the elapsed time and the number of games per second."""
+    def train(self, num_games):
+        start_time = time.perf_counter()
+        results = {"games": 0, "player1_wins": 0, "player2_wins": 0, "draws": 0, "learner_wins": 0,
+                   "learner_losses": 0}
+        self.reset(np.arange(self.num_envs))
+        while results["games"] < num_games:
+            finished, winners = self.step()
+            if not len(finished):
+                continue
+            finished, winners = finished[:num_games - results["games"]], winners[:num_games - results["games"]]
+            results["games"] += len(finished)
+            results["player1_wins"] += int((winners == 1).sum())
+            results["player2_wins"] += int((winners == 2).sum())
+            results["draws"] += int((winners == 0).sum())
+            if self.opponent != "self":
+                sides = self.learner_side[finished]
+                results["learner_wins"] += int((winners == sides).sum())
+                results["learner_losses"] += int(((winners != 0) & (winners != sides)).sum())
+            self.reset(finished)
+        results["elapsed"] = time.perf_counter() - start_time
+        results["games_per_second"] = results["games"] / results["elapsed"] if results["elapsed"] > 0 else 0.0
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trains a Q-learning agent without the GUI.")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--envs", type=int, default=256, help="number of games played at once")
+    parser.add_argument("--opponent", choices=OPPONENTS, default="self")
+    parser.add_argument("--player", type=int, choices=[1, 2], default=1,
+                        help="player whose Q table is trained (and side played against an opponent)")
+    parser.add_argument("--epsilon", type=float, default=0.1)
+    parser.add_argument("--replay-capacity", type=int, default=0,
+                        help="size of the experience replay buffer, 0 to learn from the new transitions only")
+    parser.add_argument("--replay-batch", type=int, default=4, help="transitions replayed per new transition")
+    args = parser.parse_args()
+
+    replay_buffer = ReplayBuffer(args.replay_capacity) if args.replay_capacity > 0 else None
+    agent = QLearningAlgorithm(epsilon=args.epsilon, replay_buffer=replay_buffer, replay_batch_size=args.replay_batch)
+    agent.load_q_table(q_table_file(args.player))
+    learner_player = None if args.opponent == "self" else args.player
+    trainer = SelfPlayTrainer(agent, args.opponent, args.envs, learner_player)
+    results = trainer.train(args.games)
+    agent.save_q_table(q_table_file(args.player))
+
+    print(f"{results['games']} games in {results['elapsed']:.1f} s ({results['games_per_second']:.1f} games/s)")
+    if args.opponent == "self":
+        print(f"Player 1 wins: {results['player1_wins']}, player 2 wins: {results['player2_wins']}, "
+              f"draws: {results['draws']}")
+    else:
+        print(f"Wins: {results['learner_wins']}, losses: {results['learner_losses']}, draws: {results['draws']}")
+    print(f"States in the Q table: {len(agent.q_table)}")
+
+
+if __name__ == "__main__":
+    main()
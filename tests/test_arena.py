@@ -0,0 +1,54 @@
+import pickle
+
+import numpy as np
+
+from package.arena import run_match
+from package.reinforcement.qTable import QTable
+
+
+def test_merge_adds_the_changes_of_every_worker():
+    base = QTable()
+    base.set(1, np.ones(7))
+    base.set(2, np.full(7, 2.0))
+    base.set(3, np.full(7, 3.0))
+    base.changed = set()
+    # Every worker starts from a copy of the saved table
+    worker1, worker2 = pickle.loads(pickle.dumps(base)), pickle.loads(pickle.dumps(base))
+    worker1.set(1, np.full(7, 1.5))
+    worker1.set(4, np.full(7, 0.25))
+    worker2.set(1, np.full(7, 0.5))
+    worker2.set(2, np.full(7, 2.5))
+    worker2.set(4, np.full(7, 0.5))
+    worker2.row(3)  # read only
+
+    merged = QTable.merge([worker1.changed_rows(), worker2.changed_rows()], base)
+    assert len(merged) == 4
+    # base + (1.5 - 1) + (0.5 - 1)
+    assert np.allclose(merged.get(1), 1.0)
+    assert np.allclose(merged.get(2), 2.5)
+    assert np.allclose(merged.get(3), 3.0)
+    # A new state adds up from zero
+    assert np.allclose(merged.get(4), 0.75)
+
+
+def test_merge_of_a_single_worker_is_its_table():
+    base = QTable()
+    base.set(1, np.ones(7))
+    base.changed = set()
+    worker = pickle.loads(pickle.dumps(base))
+    worker.set(1, np.full(7, 4.0))
+    worker.set(5, np.full(7, -1.0))
+    merged = QTable.merge([worker.changed_rows()], base)
+    assert sorted(merged.keys()) == [1, 5]
+    assert np.allclose(merged.get(1), 4.0) and np.allclose(merged.get(5), -1.0)
+    assert len(QTable.merge([], base)) == 1
+
+
+def test_run_match_saves_the_merged_table(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "package" / "reinforcement").mkdir(parents=True)
+    results = run_match("QLEARNING", "MINMAX", 6, workers=2)
+    assert results["games"] == 6
+    assert results["player1_wins"] + results["player2_wins"] + results["draws"] == 6
+    table = QTable.load("package/reinforcement/q_table_player1.bin")
+    assert len(table) > 0
@@ -0,0 +1,71 @@
+import random
+
+import numpy as np
+
+from package.bitboard import BitBoard
+from package.heuristic.BatchedRollouts import BatchedRollouts
+from package.heuristic.CompactMonteCarloTree import random_playout
+
+
+"""Exact probabilities (draw, player 1 wins, player 2 wins) of a random playout from the position."""
+def playout_distribution(bitboard, player):
+    moves = bitboard.legal_moves()
+    if not moves:
+        return np.array([1.0, 0.0, 0.0])
+    distribution = np.zeros(3)
+    for column in moves:
+        bit = bitboard.play(column, player)
+        if bitboard.is_winning_bit(player, bit):
+            distribution[player] += 1
+        else:
+            distribution += playout_distribution(bitboard, 3 - player)
+        bitboard.undo()
+    return distribution / len(moves)
+
+
+"""Random positions without a winner, with a few empty cells left, and the player to move."""
+def late_positions(count, empty_cells, seed):
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        bitboard = BitBoard()
+        player = 1
+        for _ in range(42 - empty_cells):
+            bit = bitboard.play(rng.choice(bitboard.legal_moves()), player)
+            if bitboard.is_winning_bit(player, bit):
+                break
+            player = 3 - player
+        else:
+            positions.append((bitboard, player))
+    return positions
+
+
+def test_results_follow_the_playout_distribution():
+    playouts = 4000
+    rollouts = BatchedRollouts(playouts, seed=1)
+    positions = late_positions(10, 5, seed=2)
+    results = rollouts.run(positions)
+    assert (results.sum(axis=1) == playouts).all()
+    for (bitboard, player), counts in zip(positions, results):
+        expected = playout_distribution(bitboard, player)
+        assert np.abs(counts / playouts - expected).max() < 0.04
+
+
+def test_batched_and_scalar_playouts_agree():
+    random.seed(3)
+    playouts = 4000
+    bitboard = BitBoard()
+    for column in (3, 3, 2, 4):
+        bitboard.play(column, 1 if bitboard.move_count() % 2 == 0 else 2)
+    batched = BatchedRollouts(playouts, seed=4).run([(bitboard, 1)])[0] / playouts
+    scalar = np.zeros(3)
+    for _ in range(playouts):
+        scalar[random_playout(bitboard.copy(), 1)] += 1
+    assert np.abs(batched - scalar / playouts).max() < 0.05
+
+
+def test_positions_are_not_modified():
+    positions = late_positions(3, 12, seed=5)
+    keys = [bitboard.key() for bitboard, _ in positions]
+    BatchedRollouts(16, seed=6).run(positions)
+    assert [bitboard.key() for bitboard, _ in positions] == keys
@@ -0,0 +1,120 @@
+import os
+import random
+
+from package.bitboard import WIDTH, BitBoard
+from package.game import ConnectFourGame
+from package.heuristic.CompactMonteCarloTree import CompactMonteCarloTree
+from package.heuristic.MonteCarloTree import MonteCarloTreeSearch
+from package.historyIndex import HistoryIndex
+
+
+def position(moves):
+    game = ConnectFourGame()
+    for column in moves:
+        game.drop_piece(column)
+    return game
+
+
+def grown_tree(moves, iterations, seed=0):
+    random.seed(seed)
+    game = position(moves)
+    tree = CompactMonteCarloTree(iterations + 1)
+    tree.set_root(game.board, game.current_player)
+    for _ in range(iterations):
+        tree.iterate()
+    return tree, game
+
+
+"""Checks the links and the statistics of every node of the subtree of the root."""
+def check_tree(tree):
+    for node in range(tree.size):
+        children = [tree.children[node * WIDTH + col] for col in range(WIDTH)]
+        for col, child in enumerate(children):
+            if child >= 0:
+                assert child > node
+                assert tree.parents[child] == node
+                assert tree.moves[child] == col
+                assert tree.players[child] == 3 - tree.players[node]
+        # Every visit of a node went on to one child, except the one that created it
+        child_visits = sum(tree.visits[child] for child in children if child >= 0)
+        assert tree.visits[node] >= child_visits
+        assert 0 <= tree.wins[node] <= tree.visits[node]
+
+
+def test_statistics_and_links():
+    tree, _ = grown_tree([3, 3, 2], 2000)
+    assert tree.visits[tree.root] == 2000
+    # One node per iteration, except the ones that reach a finished game
+    assert 1 < tree.size <= 2001
+    check_tree(tree)
+
+
+def test_finds_the_winning_move():
+    # Player 1 wins in column 3
+    tree, game = grown_tree([0, 6, 1, 6, 2, 5], 2000)
+    assert tree.best_move() == 3
+
+
+def test_tree_stops_growing_when_full():
+    tree, _ = grown_tree([], 100)
+    tree.iterate()
+    assert tree.size == tree.capacity
+    assert tree.visits[tree.root] == 101
+
+
+"""Returns {moves from the node: (visits, wins)} for the subtree of the node."""
+def subtree_statistics(tree, node, path=()):
+    statistics = {path: (tree.visits[node], tree.wins[node])}
+    for col in range(WIDTH):
+        child = tree.children[node * WIDTH + col]
+        if child >= 0:
+            statistics.update(subtree_statistics(tree, child, path + (col,)))
+    return statistics
+
+
+def most_visited_child(tree, node):
+    children = [tree.children[node * WIDTH + col] for col in range(WIDTH)]
+    return max((child for child in children if child >= 0), key=lambda child: tree.visits[child])
+
+
+def test_advance_root_keeps_the_subtree():
+    tree, game = grown_tree([3], 3000)
+    child = most_visited_child(tree, tree.root)
+    grandchild = most_visited_child(tree, child)
+    expected = subtree_statistics(tree, grandchild)
+
+    game.drop_piece(tree.moves[child])
+    game.drop_piece(tree.moves[grandchild])
+    assert tree.advance_root(BitBoard.from_grid(game.board), game.current_player)
+    assert tree.root == 0
+    assert tree.size == len(expected)
+    assert subtree_statistics(tree, tree.root) == expected
+    assert tree.root_bitboard.key() == game.get_state_key()
+    check_tree(tree)
+
+    # The search goes on from the new root
+    visits = tree.visits[tree.root]
+    for _ in range(100):
+        tree.iterate()
+    assert tree.visits[tree.root] == visits + 100
+    check_tree(tree)
+
+
+def test_advance_root_to_an_unknown_position():
+    tree, game = grown_tree([3], 50)
+    for column in (0, 0, 6, 6):
+        game.drop_piece(column)
+    assert not tree.advance_root(BitBoard.from_grid(game.board), game.current_player)
+
+
+def test_search_reuses_the_subtree_of_the_previous_move():
+    random.seed(1)
+    search = MonteCarloTreeSearch(time_limit=None, iteration_limit=2000, history_index=HistoryIndex(os.devnull))
+    game = position([3])
+    move = search.get_next_move(game.board, game.get_available_columns())
+    game.drop_piece(move)
+    game.drop_piece(3)
+    search.get_next_move(game.board, game.get_available_columns())
+    assert search.last_stats.reused_nodes > 0
+    assert search.tree.visits[search.tree.root] >= 2000 + search.last_stats.reused_nodes
+    search.close()
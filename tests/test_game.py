@@ -0,0 +1,69 @@
+import random
+
+from package.bitboard import BitBoard, grid_key
+from package.game import ConnectFourGame
+
+
+"""Winner of a 6x7 grid found by scanning every line of four, None if there is none."""
+def grid_winner(board):
+    for row in range(6):
+        for col in range(7):
+            player = board[row][col]
+            if player == 0:
+                continue
+            for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                cells = [(row + i * d_row, col + i * d_col) for i in range(4)]
+                if all(0 <= r < 6 and 0 <= c < 7 and board[r][c] == player for r, c in cells):
+                    return player
+    return None
+
+
+def play(moves):
+    game = ConnectFourGame()
+    for column in moves:
+        assert game.drop_piece(column)
+    return game
+
+
+def test_horizontal_vertical_and_diagonal_wins():
+    assert play([0, 0, 1, 1, 2, 2, 3]).check_winner() == 1
+    assert play([0, 1, 0, 1, 0, 1, 0]).check_winner() == 1
+    assert play([0, 1, 1, 2, 2, 3, 2, 3, 3, 6, 3]).check_winner() == 1
+    assert play([6, 5, 5, 4, 4, 3, 4, 3, 3, 0, 3]).check_winner() == 1
+    assert play([6, 0, 0, 1, 1, 2, 6, 3]).check_winner() == 2
+    assert play([0, 0, 1, 1, 2, 2]).check_winner() is None
+
+
+def test_win_detection_matches_a_grid_scan():
+    rng = random.Random(1)
+    for _ in range(300):
+        game = ConnectFourGame()
+        while game.check_winner() is None and not game.is_full():
+            game.drop_piece(rng.choice(game.get_available_columns()))
+            assert game.check_winner() == grid_winner(game.board)
+        assert grid_key(game.board) == game.get_state_key() == BitBoard.from_grid(game.board).key()
+
+
+def test_full_column_is_refused():
+    game = play([3] * 6)
+    assert not game.drop_piece(3)
+    assert 3 not in game.get_available_columns()
+
+
+def test_undo_move_round_trip():
+    rng = random.Random(2)
+    for _ in range(50):
+        game = ConnectFourGame()
+        snapshots = []
+        while game.check_winner() is None and not game.is_full():
+            snapshots.append(([row[:] for row in game.board], game.get_state_key(), game.current_player))
+            game.drop_piece(rng.choice(game.get_available_columns()))
+        while snapshots:
+            assert game.undo_move()
+            board, key, player = snapshots.pop()
+            assert game.board == board
+            assert game.get_state_key() == key
+            assert game.current_player == player
+            assert game.check_winner() is None
+        assert not game.undo_move()
+        assert game.get_all_moves() == []
@@ -0,0 +1,55 @@
+import json
+import os
+
+from package.gameLog import GameLog, read_games
+
+GAME = [(1, 3), (2, 3), (1, 4)]
+
+
+def test_games_are_read_back_in_order(tmp_path):
+    directory = str(tmp_path / "log")
+    game_log = GameLog(directory, flush_every=3)
+    for winner in (1, 2, None, 1):
+        game_log.append(GAME, winner)
+    # Only the first three games have been written
+    assert [game["winner"] for game in read_games(directory, str(tmp_path / "none.json"))] == [1, 2, None]
+    game_log.close()
+    games = list(read_games(directory, str(tmp_path / "none.json")))
+    assert [game["winner"] for game in games] == [1, 2, None, 1]
+    assert games[0]["moves"] == [[1, 3], [2, 3], [1, 4]]
+
+
+def test_segments_rotate(tmp_path):
+    directory = str(tmp_path / "log")
+    game_log = GameLog(directory, flush_every=1, segment_bytes=100)
+    for _ in range(10):
+        game_log.append(GAME, 1)
+    segments = sorted(os.listdir(directory))
+    assert len(segments) > 1
+    assert segments[0] == "segment-000001.jsonl"
+    assert len(list(read_games(directory, str(tmp_path / "none.json")))) == 10
+
+    # A new log goes on writing in the last segment
+    reopened = GameLog(directory, flush_every=1, segment_bytes=100)
+    assert reopened.segment_file() == os.path.join(directory, segments[-1])
+
+
+def test_legacy_history_is_read_first(tmp_path):
+    legacy_file = str(tmp_path / "game_history.json")
+    with open(legacy_file, "w") as file:
+        json.dump([{"moves": [[1, 0]], "winner": None}], file)
+    directory = str(tmp_path / "log")
+    game_log = GameLog(directory, flush_every=1)
+    game_log.append(GAME, 2)
+    assert [game["winner"] for game in read_games(directory, legacy_file)] == [None, 2]
+
+
+def test_torn_line_is_skipped_and_not_joined_to_the_next_games(tmp_path):
+    directory = str(tmp_path / "log")
+    game_log = GameLog(directory, flush_every=1)
+    game_log.append(GAME, 1)
+    # Crash in the middle of a write
+    with open(game_log.segment_file(), "a") as file:
+        file.write('{"moves":[[1,')
+    GameLog(directory, flush_every=1).append(GAME, 2)
+    assert [game["winner"] for game in read_games(directory, str(tmp_path / "none.json"))] == [1, 2]
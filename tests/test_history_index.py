@@ -0,0 +1,64 @@
+import json
+
+from package.gameLog import GameLog, log_end_position
+from package.historyIndex import HistoryIndex
+
+GAME = [(1, 3), (2, 3), (1, 4)]
+
+
+def paths(tmp_path):
+    return str(tmp_path / "history_index.json"), str(tmp_path / "log"), str(tmp_path / "none.json")
+
+
+def log_games(directory, winners, **kwargs):
+    game_log = GameLog(directory, flush_every=1, **kwargs)
+    for winner in winners:
+        game_log.append(GAME, winner)
+
+
+def test_index_is_built_from_the_log(tmp_path):
+    index_file, directory, legacy_file = paths(tmp_path)
+    log_games(directory, [1, 2, None])
+    index = HistoryIndex.load(index_file, directory, legacy_file)
+    assert index.games == 3
+    assert index.plays[0][3] == 3 and index.wins[0][3] == 1 and index.wins[1][3] == 1
+    with open(index_file) as file:
+        assert tuple(json.load(file)["log_position"]) == log_end_position(directory)
+
+
+def test_games_logged_after_the_last_save_are_added(tmp_path):
+    index_file, directory, legacy_file = paths(tmp_path)
+    index = HistoryIndex.load(index_file, directory, legacy_file)
+    game_log = GameLog(directory, flush_every=1)
+    for winner in (1, 1):
+        index.record_game(GAME, winner)
+        game_log.append(GAME, winner)
+    index.save()
+    # Crash after writing the log, before saving the index
+    for winner in (2, None, 2):
+        index.record_game(GAME, winner)
+        game_log.append(GAME, winner)
+
+    reloaded = HistoryIndex.load(index_file, directory, legacy_file)
+    assert reloaded.games == 5
+    assert reloaded.plays == index.plays and reloaded.wins == index.wins
+    assert HistoryIndex.load(index_file, directory, legacy_file).games == 5
+
+
+def test_log_tail_is_read_across_segments(tmp_path):
+    index_file, directory, legacy_file = paths(tmp_path)
+    log_games(directory, [1], segment_bytes=100)
+    HistoryIndex.load(index_file, directory, legacy_file)
+    log_games(directory, [2] * 6, segment_bytes=100)
+    assert log_end_position(directory)[0] > 1
+    reloaded = HistoryIndex.load(index_file, directory, legacy_file)
+    assert reloaded.games == 7
+    assert reloaded.wins[1][3] == 6
+
+
+def test_index_without_log_position_is_rebuilt(tmp_path):
+    index_file, directory, legacy_file = paths(tmp_path)
+    log_games(directory, [1, 2])
+    with open(index_file, "w") as file:
+        json.dump({"games": 1, "plays": [[0] * 7] * 42, "wins": [[0] * 7] * 42}, file)
+    assert HistoryIndex.load(index_file, directory, legacy_file).games == 2
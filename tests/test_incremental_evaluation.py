@@ -0,0 +1,76 @@
+import random
+
+from package.bitboard import BitBoard
+from package.game import ConnectFourGame
+from package.optimization.incrementalEvaluation import IncrementalEvaluator
+
+
+"""Scores a line of four cells: the list-board evaluation the incremental one replaced."""
+def evaluate_window(window, score_3_align, score_2_align):
+    score = 0
+    if window.count(1) == 3 and window.count(0) == 1:
+        score += score_3_align
+    elif window.count(1) == 2 and window.count(0) == 2:
+        score += score_2_align
+    if window.count(2) == 3 and window.count(0) == 1:
+        score -= score_3_align
+    return score
+
+
+"""Score of a 6x7 board without four in a row found at the given depth, computed from scratch."""
+def evaluate_board(board, depth):
+    score_3_align = 5 * (10 - depth)
+    score_2_align = 2 * (10 - depth)
+    score = [board[row][3] for row in range(6)].count(1) * 3
+    windows = []
+    for row in range(6):
+        for col in range(4):
+            windows.append([board[row][col + i] for i in range(4)])
+    for col in range(7):
+        for row in range(3):
+            windows.append([board[row + i][col] for i in range(4)])
+    for row in range(3, 6):
+        for col in range(4):
+            windows.append([board[row - i][col + i] for i in range(4)])
+    for row in range(3):
+        for col in range(4):
+            windows.append([board[row + i][col + i] for i in range(4)])
+    for window in windows:
+        score += evaluate_window(window, score_3_align, score_2_align)
+    return score
+
+
+def test_incremental_score_equals_the_full_evaluation():
+    rng = random.Random(5)
+    positions = 0
+    for _ in range(200):
+        game = ConnectFourGame()
+        bitboard = BitBoard()
+        evaluator = IncrementalEvaluator()
+        while not game.is_full():
+            column = rng.choice(game.get_available_columns())
+            player = game.current_player
+            game.drop_piece(column)
+            evaluator.play(bitboard.play(column, player), player)
+            if game.check_winner() is not None:
+                break
+            depth = rng.randrange(10)
+            assert evaluator.score(depth) == evaluate_board(game.board, depth)
+            positions += 1
+    assert positions > 1000
+
+
+def test_undo_restores_the_score():
+    rng = random.Random(6)
+    bitboard = BitBoard()
+    evaluator = IncrementalEvaluator()
+    scores = []
+    for _ in range(30):
+        column = rng.choice(bitboard.legal_moves())
+        player = 1 if len(scores) % 2 == 0 else 2
+        scores.append((evaluator.score(0), list(evaluator.codes)))
+        evaluator.play(bitboard.play(column, player), player)
+    while scores:
+        column, player = bitboard.undo()
+        evaluator.undo(bitboard.heights[column], player)
+        assert (evaluator.score(0), evaluator.codes) == scores.pop()
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+from package.bitboard import BitBoard
+from package.game import ConnectFourGame
+from package.optimization.incrementalEvaluation import IncrementalEvaluator
+from package.optimization.minMax import BUDGET_CHECK_INTERVAL, MiniMaxAlgorithm, SearchAborted
+
+# Positions as the columns played from the empty board
+POSITIONS = ["", "3", "3324", "33241560", "0123456012", "3233442155", "213500640240410044"]
+
+
+def position_game(moves):
+    game = ConnectFourGame()
+    for column in moves:
+        game.drop_piece(int(column))
+    return game
+
+
+@pytest.mark.parametrize("moves", POSITIONS)
+def test_iterative_deepening_plays_the_fixed_depth_move(moves):
+    game = position_game(moves)
+    fixed = MiniMaxAlgorithm(max_depth=4)
+    # A budget that is never spent: the search deepens one ply at a time up to max_depth
+    deepening = MiniMaxAlgorithm(max_depth=4, node_limit=10 ** 9)
+    expected = fixed.get_next_move(game.board, game.get_available_columns())
+    assert deepening.get_next_move(game.board, game.get_available_columns()) == expected
+    assert deepening.completed_depth == 4
+
+
+def test_node_budget():
+    game = position_game("3")
+    algorithm = MiniMaxAlgorithm(max_depth=20, node_limit=5000)
+    move = algorithm.get_next_move(game.board, game.get_available_columns())
+    assert move in game.get_available_columns()
+    assert algorithm.nodes <= 5000 + BUDGET_CHECK_INTERVAL + 1
+    assert 1 <= algorithm.completed_depth < 20
+
+
+def test_time_budget():
+    game = position_game("")
+    algorithm = MiniMaxAlgorithm(max_depth=30, time_limit=0.2)
+    start = time.time()
+    move = algorithm.get_next_move(game.board, game.get_available_columns())
+    assert time.time() - start < 0.5
+    assert move in game.get_available_columns()
+    assert algorithm.completed_depth >= 1
+
+
+@pytest.mark.parametrize("node_limit", [None, 3000])
+@pytest.mark.parametrize("moves", POSITIONS)
+def test_search_leaves_the_position_unchanged(moves, node_limit):
+    game = position_game(moves)
+    board = [row[:] for row in game.board]
+    algorithm = MiniMaxAlgorithm(max_depth=5, node_limit=node_limit)
+    algorithm.get_next_move(game.board, game.get_available_columns())
+
+    # Every move played by the search, including the ones of an aborted iteration, has been taken back
+    assert game.board == board
+    expected = BitBoard.from_grid(board)
+    assert algorithm.bitboard.pieces == expected.pieces
+    assert algorithm.bitboard.heights == expected.heights
+    assert algorithm.bitboard.history == []
+    evaluator = IncrementalEvaluator.from_bitboard(expected)
+    assert algorithm.evaluator.codes == evaluator.codes
+    assert algorithm.evaluator.total == evaluator.total
+
+
+def test_full_columns_are_never_played():
+    game = position_game("333333444444")
+    algorithm = MiniMaxAlgorithm(max_depth=4)
+    assert algorithm.get_next_move(game.board, game.get_available_columns()) not in (3, 4)
+
+
+@pytest.mark.parametrize("max_depth, node_limit", [(4, None), (5, 10 ** 9)])
+def test_parallel_root_split_plays_the_serial_move(max_depth, node_limit):
+    serial = MiniMaxAlgorithm(max_depth=max_depth, node_limit=node_limit)
+    parallel = MiniMaxAlgorithm(max_depth=max_depth, node_limit=node_limit, workers=2)
+    try:
+        for moves in POSITIONS:
+            game = position_game(moves)
+            expected = serial.get_next_move(game.board, game.get_available_columns())
+            assert parallel.get_next_move(game.board, game.get_available_columns()) == expected
+    finally:
+        parallel.close()
+
+
+def test_stop_search_stops_the_pool_workers():
+    game = position_game("")
+    # Far too deep to finish: only stop_search ends the search
+    parallel = MiniMaxAlgorithm(max_depth=14, workers=2)
+    outcome = []
+
+    def search():
+        try:
+            outcome.append(parallel.get_next_move(game.board, game.get_available_columns()))
+        except SearchAborted:
+            outcome.append("aborted")
+
+    try:
+        thread = threading.Thread(target=search)
+        thread.start()
+        time.sleep(1.0)
+        start = time.time()
+        parallel.stop_search()
+        thread.join(10)
+        assert not thread.is_alive()
+        assert outcome == ["aborted"]
+        # The workers are idle again: a stopped pool shuts down at once
+        parallel.close()
+        assert time.time() - start < 5
+    finally:
+        parallel.close()
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from package.game import ConnectFourGame
+from package.heuristic.MonteCarloTree import LEAF_PLAYOUTS_PER_LEAF, MonteCarloTreeSearch
+from package.historyIndex import HistoryIndex
+
+# Player 1 wins in column 3
+WINNING_MOVES = [0, 6, 1, 6, 2, 5]
+
+
+def position(moves):
+    game = ConnectFourGame()
+    for column in moves:
+        game.drop_piece(column)
+    return game
+
+
+def parallel_search(parallel, iterations, **kwargs):
+    return MonteCarloTreeSearch(time_limit=None, iteration_limit=iterations, reuse_tree=False, workers=2,
+                                parallel=parallel, history_index=HistoryIndex(os.devnull), **kwargs)
+
+
+def test_root_parallel_adds_up_the_worker_trees():
+    search = parallel_search("root", 500)
+    try:
+        game = position(WINNING_MOVES)
+        assert search.get_next_move(game.board, game.get_available_columns()) == 3
+        # Every worker runs the whole iteration budget
+        assert search.last_stats.playouts == 2 * 500
+    finally:
+        search.close()
+
+
+def test_leaf_parallel_scores_leaves_with_batched_rollouts():
+    search = parallel_search("leaf", 256)
+    try:
+        game = position(WINNING_MOVES)
+        assert search.get_next_move(game.board, game.get_available_columns()) == 3
+        assert search.rollouts.playouts_per_leaf == LEAF_PLAYOUTS_PER_LEAF
+        assert search.tree.visits[search.tree.root] == 256 * LEAF_PLAYOUTS_PER_LEAF
+        assert search.last_stats.playouts == 256 * LEAF_PLAYOUTS_PER_LEAF
+    finally:
+        search.close()
+
+
+def test_leaf_parallel_needs_several_playouts_per_leaf():
+    with pytest.raises(ValueError):
+        parallel_search("leaf", 10, playouts_per_leaf=1)
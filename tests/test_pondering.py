@@ -0,0 +1,54 @@
+import os
+import threading
+import time
+
+from package.game import ConnectFourGame
+from package.heuristic.MonteCarloTree import MonteCarloTreeSearch
+from package.historyIndex import HistoryIndex
+from package.optimization.minMax import MiniMaxAlgorithm
+
+
+def position(moves):
+    game = ConnectFourGame()
+    for column in moves:
+        game.drop_piece(column)
+    return game
+
+
+def stop_from_threads(agent, count=8):
+    errors = []
+
+    def stop():
+        try:
+            agent.stop_pondering()
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=stop) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def test_monte_carlo_pondering_grows_the_reused_tree():
+    search = MonteCarloTreeSearch(time_limit=None, iteration_limit=2000, history_index=HistoryIndex(os.devnull))
+    game = position([3])
+    search.start_pondering(game.board)
+    time.sleep(0.3)
+    search.stop_pondering()
+    assert search.tree.size > 1
+
+    game.drop_piece(3)
+    search.get_next_move(game.board, game.get_available_columns())
+    assert search.last_stats.reused_nodes > 0
+
+
+def test_stop_pondering_from_several_threads():
+    game = position([3, 3])
+    for agent in (MiniMaxAlgorithm(max_depth=6),
+                  MonteCarloTreeSearch(time_limit=None, iteration_limit=100000, history_index=HistoryIndex(os.devnull))):
+        agent.start_pondering(game.board)
+        assert stop_from_threads(agent) == []
+        assert agent.ponder_thread is None
@@ -0,0 +1,22 @@
+from package.bitboard import grid_key, mirror_key
+from package.game import ConnectFourGame
+from package.reinforcement.qLearning import QLearningAlgorithm
+
+
+def test_mirrored_positions_share_their_state():
+    game = ConnectFourGame()
+    for column in (0, 1, 0):
+        game.drop_piece(column)
+    mirror = ConnectFourGame()
+    for column in (6, 5, 6):
+        mirror.drop_piece(column)
+    assert mirror_key(grid_key(game.board)) == grid_key(mirror.board)
+
+    agent = QLearningAlgorithm(epsilon=0.0)
+    assert agent._canonical_state(grid_key(game.board))[0] == agent._canonical_state(grid_key(mirror.board))[0]
+
+    # Player 2 learns that column 2 is good in the position, then plays column 4 in its mirror
+    agent.update_q_table(game.get_state_key(), 2, 1, mirror.get_state_key(), True)
+    assert len(agent.q_table) == 1
+    assert agent.get_next_move(mirror.board, mirror.get_available_columns()) == 4
+    assert agent.get_next_move(game.board, game.get_available_columns()) == 2
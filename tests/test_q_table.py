@@ -0,0 +1,104 @@
+import numpy as np
+
+from package.reinforcement.qTable import JOURNAL_RECORD, QTable, journal_file
+
+
+def random_table(count, seed=0):
+    rng = np.random.default_rng(seed)
+    table = QTable()
+    for key in rng.choice(2 ** 48, size=count, replace=False).tolist():
+        table.set(key, rng.random(7))
+    return table
+
+
+def assert_same_table(table, expected):
+    assert len(table) == len(expected)
+    for key, values in expected.items():
+        assert np.array_equal(table.get(key), values)
+
+
+def test_save_load_round_trip(tmp_path):
+    filename = str(tmp_path / "q_table.bin")
+    table = random_table(500)
+    table.save(filename)
+    loaded = QTable.load(filename)
+    assert_same_table(loaded, table)
+
+    # States added to the loaded table and saved again
+    loaded.set(1, np.ones(7))
+    loaded.row(2)
+    loaded.save(filename)
+    reloaded = QTable.load(filename)
+    assert_same_table(reloaded, loaded)
+    assert np.array_equal(reloaded.get(2), np.zeros(7))
+
+
+def test_checkpoint_with_torn_record(tmp_path):
+    filename = str(tmp_path / "q_table.bin")
+    table = random_table(100)
+    table.save(filename)
+    key = next(iter(table.keys()))
+    table.set(key, np.full(7, 2.0))
+    table.set(3, np.full(7, 3.0))
+    table.checkpoint(filename)
+
+    # Crash in the middle of the next checkpoint
+    with open(journal_file(filename), "ab") as file:
+        file.write(b"\x01" * (JOURNAL_RECORD.itemsize // 2))
+    loaded = QTable.load(filename)
+    assert_same_table(loaded, table)
+
+
+def test_journal_of_older_generation_is_ignored(tmp_path):
+    filename = str(tmp_path / "q_table.bin")
+    table = QTable()
+    table.set(5, np.zeros(7))
+    table.save(filename)
+    table.set(5, np.ones(7))
+    table.checkpoint(filename)
+    with open(journal_file(filename), "rb") as file:
+        old_journal = file.read()
+
+    table.set(5, np.full(7, 2.0))
+    table.save(filename)
+    # A journal left over from the previous generation, such as after a crash during a save
+    with open(journal_file(filename), "wb") as file:
+        file.write(old_journal)
+    assert np.array_equal(QTable.load(filename).get(5), np.full(7, 2.0))
+
+
+def test_checkpoint_after_crash_during_save(tmp_path):
+    filename = str(tmp_path / "q_table.bin")
+    table = QTable()
+    table.set(5, np.zeros(7))
+    table.save(filename)
+    table.checkpoint(filename)
+    with open(journal_file(filename), "rb") as file:
+        old_journal = file.read()
+
+    # Crash between the replacement of the table and the one of its journal
+    table.set(5, np.ones(7))
+    table.save(filename)
+    with open(journal_file(filename), "wb") as file:
+        file.write(old_journal)
+
+    table.set(6, np.full(7, 2.0))
+    table.checkpoint(filename)
+    table.set(7, np.full(7, 3.0))
+    table.checkpoint(filename)
+    loaded = QTable.load(filename)
+    assert_same_table(loaded, table)
+
+
+def test_checkpoint_after_torn_record(tmp_path):
+    filename = str(tmp_path / "q_table.bin")
+    table = random_table(100)
+    table.save(filename)
+    table.set(1, np.ones(7))
+    table.checkpoint(filename)
+    with open(journal_file(filename), "ab") as file:
+        file.write(b"\x01" * (JOURNAL_RECORD.itemsize // 2))
+
+    table.set(2, np.full(7, 2.0))
+    table.checkpoint(filename)
+    assert_same_table(QTable.load(filename), table)
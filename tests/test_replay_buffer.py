@@ -0,0 +1,50 @@
+import numpy as np
+
+from package.reinforcement.replayBuffer import ReplayBuffer
+
+
+def contents(buffer):
+    # Transitions from the oldest to the newest
+    order = (buffer.position - buffer.size + np.arange(buffer.size)) % buffer.capacity
+    return buffer.states[order].tolist()
+
+
+def test_add_wraps_around():
+    buffer = ReplayBuffer(capacity=4, seed=0)
+    for state in range(1, 7):
+        buffer.add(state, state % 7, 0.5, state + 100, state % 2 == 0)
+    assert len(buffer) == 4
+    assert buffer.position == 2
+    assert contents(buffer) == [3, 4, 5, 6]
+    assert buffer.next_states[buffer.states == 6].tolist() == [106]
+
+
+def test_add_batch_wraps_around():
+    buffer = ReplayBuffer(capacity=5, seed=0)
+    for start in (1, 4, 7):
+        states = np.arange(start, start + 3, dtype=np.uint64)
+        buffer.add_batch(states, states % 7, np.zeros(3), states + 100, np.zeros(3, dtype=bool))
+    assert len(buffer) == 5
+    assert buffer.position == 4
+    assert contents(buffer) == [5, 6, 7, 8, 9]
+    assert (buffer.next_states == buffer.states + 100).all()
+
+
+def test_add_batch_larger_than_the_capacity_keeps_the_last_transitions():
+    buffer = ReplayBuffer(capacity=4, seed=0)
+    buffer.add(1, 0, 0.0, 2, False)
+    states = np.arange(10, 20, dtype=np.uint64)
+    buffer.add_batch(states, states % 7, states.astype(float), states + 1, states % 2 == 0)
+    assert len(buffer) == 4
+    assert contents(buffer) == [16, 17, 18, 19]
+    assert (buffer.rewards == buffer.states.astype(float)).all()
+
+
+def test_sample_only_returns_stored_transitions():
+    buffer = ReplayBuffer(capacity=8, seed=0)
+    for state in range(3):
+        buffer.add(state, state, float(state), state + 1, False)
+    states, actions, rewards, next_states, dones = buffer.sample(100)
+    assert set(states.tolist()) <= {0, 1, 2}
+    assert (actions == states).all() and (rewards == states).all() and (next_states == states + 1).all()
+    assert not dones.any()
@@ -0,0 +1,79 @@
+import pytest
+
+from package.game import ConnectFourGame
+from package.openingBook import UNKNOWN_SCORE, generate_opening_book
+from package.optimization.solver import ConnectFourSolver, SolverAgent
+
+# Positions as the columns played from the empty board, and their score for the player to move
+KNOWN_POSITIONS = [
+    ("0461326626630053124312253053164", -5),
+    ("6354154051352325230254233021", -6),
+    ("152233345052126300642614626506", 6),
+    ("46501623543526323350152560040662", 5),
+    ("1035663430036463310111560640", 7),
+]
+# Positions of the test set of J. Pons' solver, whose columns are numbered from 1
+PONS_POSITIONS = [
+    ("2252576253462244111563365343671351441", -1),
+    ("7422341735647741166133573473242566", 1),
+    ("23163416124767223154467471272416755633", 0),
+    ("65214673556155731566316327373221417", -1),
+]
+
+
+def position_board(moves, first_column=0):
+    game = ConnectFourGame()
+    for column in moves:
+        assert game.drop_piece(int(column) - first_column)
+        assert game.check_winner() is None
+    return game.board
+
+
+@pytest.mark.parametrize("moves, score", KNOWN_POSITIONS)
+def test_solve_known_positions(moves, score):
+    assert ConnectFourSolver().solve(position_board(moves)) == score
+
+
+@pytest.mark.parametrize("moves, score", KNOWN_POSITIONS)
+def test_weak_solve_known_positions(moves, score):
+    assert ConnectFourSolver().solve(position_board(moves), weak=True) == (score > 0) - (score < 0)
+
+
+@pytest.mark.parametrize("moves, score", PONS_POSITIONS)
+def test_solve_pons_positions(moves, score):
+    assert ConnectFourSolver().solve(position_board(moves, first_column=1)) == score
+
+
+def test_best_move_wins_at_once():
+    board = position_board("1035663430036463310111560640")
+    solver = ConnectFourSolver()
+    column = solver.get_next_move(board, [col for col in range(7) if board[0][col] == 0])
+    assert solver.analyze(board)[column] == 7
+
+
+class RecordingAgent:
+    def __init__(self):
+        self.boards = []
+
+    def get_next_move(self, board, available_columns):
+        self.boards.append(board)
+        return available_columns[0]
+
+
+def test_solver_agent_falls_back_in_the_opening():
+    fallback = RecordingAgent()
+    agent = SolverAgent(min_ply=20, fallback=fallback)
+    opening = position_board("3323")
+    assert agent.get_next_move(opening, list(range(7))) == 0
+    assert fallback.boards == [opening]
+
+    board = position_board("1035663430036463310111560640")
+    available_columns = [col for col in range(7) if board[0][col] == 0]
+    assert agent.get_next_move(board, available_columns) == ConnectFourSolver().get_next_move(board, available_columns)
+    assert len(fallback.boards) == 1
+
+
+def test_exact_book_only_solves_late_positions():
+    entries = generate_opening_book(2, depth=2, exact=True)
+    assert len(entries) == 5
+    assert all(score == UNKNOWN_SCORE for _, score in entries.values())
@@ -0,0 +1,92 @@
+import numpy as np
+
+from package.agents import update_learning_agent
+from package.bitboard import BitBoard, mirror_key
+from package.game import ConnectFourGame
+from package.reinforcement.qLearning import QLearningAlgorithm
+from package.reinforcement.trainer import SelfPlayTrainer, mirror_keys, state_keys
+
+
+def random_bitboards(count, seed=0):
+    rng = np.random.default_rng(seed)
+    bitboards = []
+    for _ in range(count):
+        bitboard = BitBoard()
+        player = 1
+        for _ in range(rng.integers(0, 30)):
+            bitboard.play(int(rng.choice(bitboard.legal_moves())), player)
+            player = 3 - player
+        bitboards.append(bitboard)
+    return bitboards
+
+
+def q_table_items(agent):
+    keys, values = agent.q_table._arrays()
+    return dict(zip(keys.tolist(), values.tolist()))
+
+
+def test_state_and_mirror_keys_match_the_bitboard():
+    bitboards = random_bitboards(200)
+    pieces1 = np.array([bitboard.pieces[1] for bitboard in bitboards], dtype=np.uint64)
+    mask = np.array([bitboard.mask() for bitboard in bitboards], dtype=np.uint64)
+    keys = state_keys(pieces1, mask)
+    assert keys.tolist() == [bitboard.key() for bitboard in bitboards]
+    assert mirror_keys(keys).tolist() == [mirror_key(bitboard.key()) for bitboard in bitboards]
+
+
+def test_step_applies_the_updates_of_the_gui():
+    columns = [3, 3, 4, 4, 2, 2, 5]  # player 1 wins on the bottom row
+    trainer = SelfPlayTrainer(QLearningAlgorithm(), num_envs=1)
+    moves = iter(columns)
+    trainer.learner_moves = lambda keys, legal: np.array([next(moves)])
+    for _ in columns[:-1]:
+        finished, _ = trainer.step()
+        assert not len(finished)
+    finished, winners = trainer.step()
+    assert finished.tolist() == [0] and winners.tolist() == [1]
+
+    agent = QLearningAlgorithm()
+    game = ConnectFourGame()
+    for column in columns:
+        state = game.get_state_key()
+        game.drop_piece(column)
+        update_learning_agent(game, agent, agent, state, column)
+    assert game.check_winner() == 1
+
+    expected = q_table_items(agent)
+    trained = q_table_items(trainer.agent)
+    assert trained.keys() == expected.keys()
+    for key in expected:
+        assert key <= mirror_key(key)
+        assert np.allclose(trained[key], expected[key])
+
+
+def test_updates_of_the_same_q_value_compound():
+    agent = QLearningAlgorithm()
+    trainer = SelfPlayTrainer(agent, num_envs=8)
+    trainer.learner_moves = lambda keys, legal: np.full(len(keys), 3)
+    trainer.step()
+
+    # Eight updates of the empty board with the small penalty to continue
+    q_values = agent.q_table.get(BitBoard().key())
+    assert np.isclose(q_values[3], -0.1 * (1 - (1 - agent.alpha) ** 8))
+    assert agent.updates == 8
+
+    # Mixed duplicates give the same values as updates applied one by one
+    rng = np.random.default_rng(1)
+    rows = agent.q_table.rows(list(range(1, 5)))
+    agent.q_table.values[rows] = rng.random((4, 7))
+    before = agent.q_table.values[rows].copy()
+    current_rows = rows[[0, 0, 1, 0, 2, 1]]
+    actions = np.array([3, 3, 2, 3, 0, 2], dtype=np.int8)
+    rewards = np.array([1, 0.5, -1, 0, 0.2, 0.3])
+    next_rows = rows[[1, 2, 3, 3, 0, 2]]
+    dones = np.array([False, True, False, False, True, False])
+    agent.update_q_values(current_rows, actions, rewards, next_rows, dones)
+
+    expected = before.copy()
+    targets = rewards + agent.gamma * before[[1, 2, 3, 3, 0, 2]].max(axis=1) * (1 - dones)
+    for index, row in enumerate([0, 0, 1, 0, 2, 1]):
+        action = actions[index]
+        expected[row, action] = (1 - agent.alpha) * expected[row, action] + agent.alpha * targets[index]
+    assert np.allclose(agent.q_table.values[rows], expected)
@@ -0,0 +1,47 @@
+from package.optimization.transpositionTable import EXACT, LOWER_BOUND, UPPER_BOUND, TranspositionTable
+
+
+def test_store_and_lookup():
+    table = TranspositionTable(11)
+    assert table.lookup(5) is None
+    table.store(5, 12, 3, EXACT)
+    assert table.lookup(5) == (12, 3, EXACT)
+    # The same key is updated in place
+    table.store(5, -4, 1, LOWER_BOUND)
+    assert table.lookup(5) == (-4, 1, LOWER_BOUND)
+    assert table.hit_rate() == 2 / 3
+
+
+def test_two_entries_per_bucket():
+    table = TranspositionTable(11)
+    table.store(3, 1, 2, EXACT)
+    table.store(3 + 11, 2, 5, UPPER_BOUND)
+    # The deeper entry takes the depth-preferred slot, the other one moves to the second slot
+    assert table.lookup(3) == (1, 2, EXACT)
+    assert table.lookup(3 + 11) == (2, 5, UPPER_BOUND)
+
+
+def test_replacement_keeps_the_deepest_entry():
+    table = TranspositionTable(11)
+    table.store(4, 1, 6, EXACT)
+    table.store(4 + 11, 2, 1, EXACT)
+    table.store(4 + 22, 3, 2, EXACT)
+    # Shallower entries only replace the always-replace slot
+    assert table.lookup(4) == (1, 6, EXACT)
+    assert table.lookup(4 + 11) is None
+    assert table.lookup(4 + 22) == (3, 2, EXACT)
+
+    # A deeper entry takes the first slot and moves the old one down
+    table.store(4 + 33, 4, 7, EXACT)
+    assert table.lookup(4 + 33) == (4, 7, EXACT)
+    assert table.lookup(4) == (1, 6, EXACT)
+    assert table.lookup(4 + 22) is None
+
+
+def test_clear():
+    table = TranspositionTable(11)
+    table.store(1, 1, 1, EXACT)
+    table.lookup(1)
+    table.clear()
+    assert table.lookup(1) is None
+    assert table.hits == 0 and table.misses == 1